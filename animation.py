@@ -0,0 +1,258 @@
+import itertools
+import math
+import time
+
+from sort_algorithms import count_events, estimate_step_count, event_indices, new_metrics
+
+# Bounds for the live speed multiplier
+MIN_SPEED = 1 / 16
+MAX_SPEED = 64
+# Events pulled between checks of the per-frame compute limit
+STEP_CHUNK = 512
+
+
+class StepScheduler:
+    # Paces a step-event generator so the whole animation takes about
+    # target_seconds, however many events the sort produces. Each frame also
+    # stops once compute_fraction of the frame time is spent, so very large
+    # sorts run longer than the target instead of freezing the window.
+    def __init__(self, steps, estimated_steps, target_seconds=20.0, fps=60, compute_fraction=0.5):
+        self.steps = steps
+        self.estimated_steps = max(1, estimated_steps)
+        self.target_seconds = target_seconds
+        self.fps = fps
+        self.frame_compute_limit = compute_fraction / fps
+        self.speed = 1.0
+        self.applied = 0
+        self.frames = 0
+        self.start_time = None
+        self.paused_at = None
+        self.done = False
+
+    def elapsed(self):
+        if self.start_time is None:
+            return 0.0
+        end = self.paused_at if self.paused_at is not None else time.perf_counter()
+        return end - self.start_time
+
+    def steps_per_frame(self):
+        if self.frames == 0:
+            frame_time = 1.0 / self.fps
+            elapsed = 0.0
+        else:
+            elapsed = self.elapsed()
+            # Use the measured frame time so slow frames don't stretch the animation
+            frame_time = max(elapsed / self.frames, 1.0 / self.fps)
+        frames_left = max(1.0, (self.target_seconds - elapsed) / frame_time)
+
+        # The estimate is only approximate; if the sort runs past it,
+        # assume there is as much work left as has been done so far
+        if self.applied >= self.estimated_steps:
+            self.estimated_steps = self.applied * 2
+        remaining = self.estimated_steps - self.applied
+        return max(1, math.ceil(remaining / frames_left * self.speed))
+
+    def step(self, count):
+        # Pull exactly `count` events; the generator applies them to the data
+        if self.done:
+            return []
+        events = list(itertools.islice(self.steps, count))
+        self.applied += len(events)
+        if len(events) < count:
+            self.done = True
+        return events
+
+    def advance(self):
+        # Pull one frame's worth of events, in chunks until the budget or the
+        # frame's compute limit runs out
+        now = time.perf_counter()
+        if self.start_time is None:
+            self.start_time = now
+        deadline = now + self.frame_compute_limit
+        budget = self.steps_per_frame()
+        events = []
+        while len(events) < budget and not self.done:
+            events.extend(self.step(min(STEP_CHUNK, budget - len(events))))
+            if time.perf_counter() > deadline:
+                break
+        self.frames += 1
+        return events
+
+    def pause(self):
+        if self.paused_at is None:
+            self.paused_at = time.perf_counter()
+
+    def resume(self):
+        # Shift the start so time spent paused doesn't count against the target
+        if self.paused_at is not None:
+            if self.start_time is not None:
+                self.start_time += time.perf_counter() - self.paused_at
+            self.paused_at = None
+
+    def change_speed(self, factor):
+        self.speed = min(MAX_SPEED, max(MIN_SPEED, self.speed * factor))
+
+
+class SortRun:
+    # A sort in progress on an ElevationStore, stepped cooperatively from the
+    # render loop so the window keeps handling input while it runs
+    def __init__(self, sort_steps, data, metrics, target_seconds=20.0, fps=60, recorder=None):
+        self.sort_steps = sort_steps
+        self.data = data
+        self.metrics = metrics
+        self.recorder = recorder
+        # Sorts permute the store's index array, keyed by (elev, idx) per cell
+        steps = sort_steps(data.order, metrics, key=data.sort_key())
+        if recorder is not None:
+            steps = recorder.record(steps)
+        self.scheduler = StepScheduler(steps, estimate_step_count(sort_steps, len(data)), target_seconds, fps)
+        self.highlight = ()
+        self.compute_time = 0.0
+
+    @property
+    def done(self):
+        return self.scheduler.done
+
+    @property
+    def paused(self):
+        return self.scheduler.paused_at is not None
+
+    def _record(self, events, start):
+        # Counting per batch keeps the live counters exact at every frame
+        if self.metrics is not None:
+            count_events(events, self.metrics)
+        self.compute_time += time.perf_counter() - start
+        if events:
+            self.highlight = event_indices(events[-1])
+        return events
+
+    def advance(self):
+        # One frame's worth of events, or nothing while paused
+        if self.paused:
+            return []
+        start = time.perf_counter()
+        return self._record(self.scheduler.advance(), start)
+
+    def single_step(self):
+        return self.pull(1)
+
+    def pull(self, count):
+        # Exactly `count` events, whatever the pacing; used by Race
+        start = time.perf_counter()
+        return self._record(self.scheduler.step(count), start)
+
+    def toggle_pause(self):
+        if self.paused:
+            self.scheduler.resume()
+        else:
+            self.scheduler.pause()
+
+    def elapsed(self):
+        return self.scheduler.elapsed()
+
+
+class RaceLane:
+    # One sort in a race, on its own copy of the grid
+    def __init__(self, name, sort_steps, data, fps=60):
+        self.name = name
+        self.data = data
+        self.metrics = new_metrics()
+        self.run = SortRun(sort_steps, data, self.metrics, fps=fps)
+        # Finishing position (1 = winner) and the compute time it took
+        self.place = None
+        self.finish_time = None
+
+    @property
+    def done(self):
+        return self.run.done
+
+    @property
+    def steps(self):
+        return self.run.scheduler.applied
+
+    def throughput(self):
+        # Step events per second of compute, the speed figure shown per lane
+        return self.steps / self.run.compute_time if self.run.compute_time else 0.0
+
+    def advance(self, allowance, time_slice):
+        # Up to `allowance` events, stopping early once time_slice seconds are used
+        deadline = time.perf_counter() + time_slice
+        events = []
+        while len(events) < allowance and not self.done:
+            events.extend(self.run.pull(min(STEP_CHUNK, allowance - len(events))))
+            if time.perf_counter() > deadline:
+                break
+        return events
+
+
+class Race:
+    # Several sorts over identical copies of one grid, advanced by one shared
+    # scheduler. Each frame every unfinished lane gets the same step allowance
+    # and the same slice of the frame's compute limit, and the lane that goes
+    # first rotates, so no sort gains from always running with warm caches.
+    # The allowance is paced so the median lane, by estimated step count,
+    # finishes in about target_seconds; on large grids the time slice is
+    # what binds, and lanes then progress at their real relative speeds.
+    def __init__(self, sorts, data, target_seconds=20.0, fps=60, compute_fraction=0.5):
+        self.lanes = [RaceLane(name, sort_steps, data.snapshot(), fps) for name, sort_steps in sorts.items()]
+        self.frame_compute_limit = compute_fraction / fps
+        estimates = sorted(estimate_step_count(sort_steps, len(data)) for sort_steps in sorts.values())
+        self.base_allowance = estimates[len(estimates) // 2] / max(1.0, target_seconds * fps)
+        self.speed = 1.0
+        self.frames = 0
+        self.start_time = None
+        self.paused_at = None
+
+    @property
+    def done(self):
+        return all(lane.done for lane in self.lanes)
+
+    @property
+    def paused(self):
+        return self.paused_at is not None
+
+    def allowance(self):
+        return max(1, math.ceil(self.base_allowance * self.speed))
+
+    def advance(self):
+        # One frame of work for every unfinished lane; returns {lane: events}
+        if self.paused or self.done:
+            return {}
+        if self.start_time is None:
+            self.start_time = time.perf_counter()
+        active = [lane for lane in self.lanes if not lane.done]
+        first = self.frames % len(active)
+        return self._run(active[first:] + active[:first], self.allowance(),
+                         self.frame_compute_limit / len(active))
+
+    def single_step(self):
+        return self._run([lane for lane in self.lanes if not lane.done], 1, math.inf)
+
+    def _run(self, lanes, allowance, time_slice):
+        events = {lane: lane.advance(allowance, time_slice) for lane in lanes}
+        self.frames += 1
+        # Lanes finishing in the same frame are placed by compute time used
+        finished = sorted((lane for lane in lanes if lane.done), key=lambda lane: lane.run.compute_time)
+        placed = sum(lane.place is not None for lane in self.lanes)
+        for lane in finished:
+            placed += 1
+            lane.place = placed
+            lane.finish_time = lane.run.compute_time
+        return events
+
+    def elapsed(self):
+        if self.start_time is None:
+            return 0.0
+        end = self.paused_at if self.paused_at is not None else time.perf_counter()
+        return end - self.start_time
+
+    def toggle_pause(self):
+        if self.paused_at is None:
+            self.paused_at = time.perf_counter()
+        else:
+            if self.start_time is not None:
+                self.start_time += time.perf_counter() - self.paused_at
+            self.paused_at = None
+
+    def change_speed(self, factor):
+        self.speed = min(MAX_SPEED, max(MIN_SPEED, self.speed * factor))
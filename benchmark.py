@@ -0,0 +1,296 @@
+import argparse
+import csv
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from elevation_sources import FakeRemoteSource, SyntheticSource
+from elevation_store import ElevationStore
+from parallel_sort import parallel_sort
+from sort_algorithms import SORT_ALGORITHMS, new_metrics, run_sort
+from tiled_fetch import PartialFetchError, TiledSource
+
+DISTRIBUTIONS = ["random", "sorted", "reversed", "plateaus", "terrain"]
+# Scripted run whose wall time is held to the startup budget
+STARTUP_COMMAND = ["main.py", "--headless", "--source", "synthetic", "--rows", "20", "--cols", "20",
+                   "--algorithm", "Quick", "--seed", "0"]
+RESULT_FIELDS = ["algorithm", "distribution", "size", "seconds", "comparisons", "swaps", "passes"]
+
+
+def make_points(elevations):
+    # Same store layout the visualizer sorts, on a 0.1° grid
+    cols = max(1, int(len(elevations) ** 0.5))
+    cells = np.arange(len(elevations))
+    return ElevationStore(cells // cols * 0.1, cells % cols * 0.1, elevations)
+
+
+def generate_elevations(distribution, size, rng):
+    if distribution == "plateaus":
+        # Flat terraces of integer elevations, like ETOPO1 cells over plains and plateaus
+        elevations = []
+        level = rng.randint(-500, 2000)
+        while len(elevations) < size:
+            elevations.extend([level] * rng.randint(1, 40))
+            level = max(-11000, min(9000, level + rng.randint(-300, 300)))
+        return elevations[:size]
+
+    if distribution == "terrain":
+        # Row-major cells of a synthetic terrain grid, as the visualizer would load them
+        cols = max(1, int(size ** 0.5))
+        rows = -(-size // cols)
+        grid = SyntheticSource(rng.randrange(2 ** 32)).fetch(rng.uniform(-60, 60), rng.uniform(-170, 170), rows, cols, 0.1)
+        return grid.ravel()[:size].tolist()
+
+    elevations = [rng.randint(-11000, 9000) for _ in range(size)]
+    if distribution == "sorted":
+        elevations.sort()
+    elif distribution == "reversed":
+        elevations.sort(reverse=True)
+    return elevations
+
+
+def benchmark_sort(name, points, repeat, count=True):
+    # Without counting, metrics come back as None and only the time is measured
+    best = None
+    metrics = None
+    expected = np.lexsort((points.idx, points.elev))
+    for _ in range(repeat):
+        data = points.snapshot()
+        run_metrics = new_metrics() if count else None
+        start = time.perf_counter()
+        run_sort(SORT_ALGORITHMS[name], data.order, run_metrics, key=data.sort_key())
+        elapsed = time.perf_counter() - start
+        if not np.array_equal(data.order, expected):
+            raise RuntimeError(f"{name} sort produced unsorted output")
+        if best is None or elapsed < best:
+            best = elapsed
+        metrics = run_metrics
+    return best, metrics
+
+
+def run_benchmarks(algorithms, distributions, sizes, repeat=1, seed=0, count=True):
+    results = []
+    for distribution in distributions:
+        for size in sizes:
+            # Every algorithm sees the same input for a given distribution and size
+            points = make_points(generate_elevations(distribution, size, random.Random(f"{seed}-{distribution}-{size}")))
+            for name in algorithms:
+                seconds, metrics = benchmark_sort(name, points, repeat, count)
+                metrics = metrics or dict.fromkeys(("comparisons", "swaps", "passes"))
+                results.append({
+                    "algorithm": name,
+                    "distribution": distribution,
+                    "size": size,
+                    "seconds": seconds,
+                    "comparisons": metrics["comparisons"],
+                    "swaps": metrics["swaps"],
+                    "passes": metrics["passes"],
+                })
+                line = f"{name:<10} {distribution:<9} n={size:<7} {seconds:9.4f}s"
+                if count:
+                    line += f"  comparisons={metrics['comparisons']}  swaps={metrics['swaps']}  passes={metrics['passes']}"
+                print(line)
+    return results
+
+
+def run_parallel_benchmarks(distributions, sizes, worker_counts, seed=0):
+    # Scaling of the process-pool sort from 1 to N workers on identical inputs
+    results = []
+    for distribution in distributions:
+        for size in sizes:
+            points = make_points(generate_elevations(distribution, size, random.Random(f"{seed}-{distribution}-{size}")))
+            expected = np.lexsort((points.idx, points.elev))
+            baseline = None
+            for workers in worker_counts:
+                data = points.snapshot()
+                stats = parallel_sort(data, workers, min_cells=0)
+                if not np.array_equal(data.order, expected):
+                    raise RuntimeError(f"parallel sort with {workers} workers produced unsorted output")
+                baseline = baseline or stats["seconds"]
+                results.append({"distribution": distribution, "size": size, **stats})
+                print(f"parallel   {distribution:<9} n={size:<7} workers={workers:<3} {stats['seconds']:9.4f}s  "
+                      f"speedup={baseline / stats['seconds']:.2f}x  efficiency={stats['efficiency']:.0%}")
+                for worker in stats["per_worker"]:
+                    print(f"    worker {worker['worker']}: chunk={worker['chunk']} sort={worker['sort_seconds']:.4f}s  "
+                          f"bucket={worker['bucket']} merge={worker['merge_seconds']:.4f}s")
+    return results
+
+
+def run_fetch_benchmarks(worker_counts, size, latency, failure_rate, seed=0):
+    # Tiled fetch throughput against the offline stand-in service, from 1 to N
+    # concurrent requests; complete grids are checked against a single fetch
+    results = []
+    expected = SyntheticSource(seed).fetch(10.0, 20.0, size, size, 0.1)
+    for workers in worker_counts:
+        source = TiledSource(FakeRemoteSource(latency, failure_rate, seed), workers=workers)
+        try:
+            grid = source.fetch(10.0, 20.0, size, size, 0.1)
+            if not np.array_equal(grid, expected):
+                raise RuntimeError(f"tiled fetch with {workers} workers stitched the wrong grid")
+        except PartialFetchError as e:
+            print(f"  {e}")
+        stats = source.last_stats
+        results.append({"size": size, "workers": workers, **stats})
+        print(f"fetch      {size}x{size} workers={workers:<3} {stats['seconds']:8.3f}s  "
+              f"{stats['cells_per_second']:10.0f} cells/s  tiles={stats['tiles']}  retries={stats['retries']}  failed={stats['failed']}")
+    return results
+
+
+def fastest_by_case(results):
+    # Quickest algorithm for each (distribution, size) pair
+    best = {}
+    for result in results:
+        case = (result["distribution"], result["size"])
+        if case not in best or result["seconds"] < best[case]["seconds"]:
+            best[case] = result
+    return best
+
+
+def measure_startup(repeat=3):
+    # Best wall time of a fresh interpreter running the scripted command
+    here = os.path.dirname(os.path.abspath(__file__))
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable] + STARTUP_COMMAND, cwd=here, stdin=subprocess.DEVNULL,
+                       stdout=subprocess.DEVNULL, check=True)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def import_times(module):
+    # (cumulative seconds, name) for `module` and everything it imported, slowest
+    # first. Nested imports are listed indented, just before the module itself.
+    here = os.path.dirname(os.path.abspath(__file__))
+    output = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=here,
+                            capture_output=True, text=True, check=True).stderr
+    times = []
+    for line in output.splitlines():
+        parts = line.split("|")
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        name = parts[2].rstrip()
+        if not name.startswith("  "):
+            # A top-level import ends the group of lines before it
+            if name.strip() == module:
+                times.append((int(parts[1]) / 1e6, module))
+                return sorted(times, reverse=True)
+            times = []
+            continue
+        times.append((int(parts[1]) / 1e6, name.strip()))
+    return []
+
+
+def check_startup(budget):
+    for module in ("main", "sorting_visualizer"):
+        times = import_times(module)
+        total = next((seconds for seconds, name in times if name == module), 0.0)
+        slowest = ", ".join(f"{name} {seconds * 1000:.0f} ms" for seconds, name in times if name != module)
+        print(f"import {module}: {total * 1000:.0f} ms ({', '.join(slowest.split(', ')[:3])})")
+    seconds = measure_startup()
+    print(f"Scripted run (python {' '.join(STARTUP_COMMAND)}): {seconds:.3f}s, budget {budget:.3f}s")
+    return seconds <= budget
+
+
+def write_json(results, path):
+    with open(path, "w") as f:
+        json.dump({"results": results}, f, indent=2)
+
+
+def write_csv(results, path):
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=RESULT_FIELDS)
+        writer.writeheader()
+        writer.writerows(results)
+
+
+def compare_to_baseline(results, baseline_path, tolerance):
+    with open(baseline_path) as f:
+        baseline = {(r["algorithm"], r["distribution"], r["size"]): r for r in json.load(f)["results"]}
+
+    regressions = []
+    for result in results:
+        old = baseline.get((result["algorithm"], result["distribution"], result["size"]))
+        if old is None:
+            continue
+        label = f"{result['algorithm']} {result['distribution']} n={result['size']}"
+        if result["seconds"] > old["seconds"] * (1 + tolerance):
+            regressions.append(f"{label}: {old['seconds']:.4f}s -> {result['seconds']:.4f}s")
+        # Inputs are seeded, so operation counts should match exactly
+        for field in ("comparisons", "swaps", "passes"):
+            if old.get(field) is not None and result[field] is not None and result[field] != old[field]:
+                regressions.append(f"{label}: {field} {old[field]} -> {result[field]}")
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Headless benchmark of the elevation sorts (no pygame, no matplotlib).")
+    parser.add_argument("--algorithms", nargs="+", default=list(SORT_ALGORITHMS), choices=list(SORT_ALGORITHMS))
+    parser.add_argument("--distributions", nargs="+", default=DISTRIBUTIONS, choices=DISTRIBUTIONS)
+    parser.add_argument("--sizes", nargs="+", type=int, default=[100, 500, 1000])
+    parser.add_argument("--repeat", type=int, default=3, help="runs per case; the fastest is reported")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="write results to this JSON file")
+    parser.add_argument("--csv", help="write results to this CSV file")
+    parser.add_argument("--baseline", help="JSON results to compare against")
+    parser.add_argument("--no-count", action="store_true",
+                        help="skip comparison/swap counting to time pure sorting throughput")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown vs baseline (0.25 = 25%%)")
+    parser.add_argument("--startup", action="store_true",
+                        help="measure import and scripted start-up time instead of sorting")
+    parser.add_argument("--startup-budget", type=float, default=1.0, help="allowed start-up seconds with --startup")
+    parser.add_argument("--workers", nargs="+", type=int,
+                        help="also time the multi-process sort with these worker counts, e.g. 1 2 4 8")
+    parser.add_argument("--fetch", nargs="+", type=int, metavar="WORKERS",
+                        help="time tiled fetching from a simulated service with these worker counts instead of sorting")
+    parser.add_argument("--fetch-grid", type=int, default=256, help="grid side length for --fetch")
+    parser.add_argument("--fetch-latency", type=float, default=0.05, help="simulated seconds per tile request")
+    parser.add_argument("--fetch-failures", type=float, default=0.05, help="share of simulated requests that fail")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.startup:
+        if check_startup(args.startup_budget):
+            print("Start-up within budget.")
+            return 0
+        print("Start-up over budget.")
+        return 1
+    if args.fetch:
+        run_fetch_benchmarks(args.fetch, args.fetch_grid, args.fetch_latency, args.fetch_failures, args.seed)
+        return 0
+
+    results = run_benchmarks(args.algorithms, args.distributions, args.sizes, args.repeat, args.seed, not args.no_count)
+
+    print("Fastest per input:")
+    for (distribution, size), result in fastest_by_case(results).items():
+        print(f"  {distribution:<9} n={size:<7} {result['algorithm']} ({result['seconds']:.4f}s)")
+
+    if args.workers:
+        run_parallel_benchmarks(args.distributions, args.sizes, args.workers, args.seed)
+
+    if args.json:
+        write_json(results, args.json)
+    if args.csv:
+        write_csv(results, args.csv)
+
+    if args.baseline:
+        regressions = compare_to_baseline(results, args.baseline, args.tolerance)
+        if regressions:
+            print("Regressions against baseline:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print("No regressions against baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
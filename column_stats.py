@@ -0,0 +1,53 @@
+import numpy as np
+
+
+class ColumnStats:
+    # Splits the display order into one bucket per drawn column and keeps the
+    # min/max/mean elevation of each. With no more points than pixels every
+    # bucket holds a single bar; beyond that each pixel column aggregates a run
+    # of points, so a million-cell grid still draws as `width` columns.
+    def __init__(self, data, width):
+        self.data = data
+        n = len(data)
+        self.count = max(1, min(n, width))
+        self.column_width = max(1, width // self.count)
+        self.edges = (np.arange(self.count + 1, dtype=np.int64) * n) // self.count
+        self.refresh()
+
+    def refresh(self):
+        # Recompute every bucket with vectorized reductions
+        elevations = self.data.elevations().astype(np.float64)
+        if len(elevations) == 0:
+            self.min = self.max = self.mean = np.zeros(self.count)
+            return
+        starts = self.edges[:-1]
+        self.min = np.minimum.reduceat(elevations, starts)
+        self.max = np.maximum.reduceat(elevations, starts)
+        self.mean = np.add.reduceat(elevations, starts) / np.diff(self.edges)
+
+    def column_of(self, positions):
+        # Bucket containing each display position
+        return np.searchsorted(self.edges, positions, side="right") - 1
+
+    def columns_of(self, positions):
+        if not positions:
+            return set()
+        return set(self.column_of(np.fromiter(positions, dtype=np.int64, count=len(positions))).tolist())
+
+    def update(self, positions):
+        # Refresh only the buckets the given positions fall in; returns those columns
+        columns = self.columns_of(positions)
+        for column in columns:
+            segment = self.data.elev[self.data.order[self.edges[column]:self.edges[column + 1]]]
+            self.min[column] = segment.min()
+            self.max[column] = segment.max()
+            self.mean[column] = segment.mean(dtype=np.float64)
+        return columns
+
+    def positions(self, column):
+        return int(self.edges[column]), int(self.edges[column + 1])
+
+    def column_at(self, x):
+        # Column under a pixel x coordinate, or None past the last column
+        column = x // self.column_width
+        return column if 0 <= column < self.count else None
@@ -0,0 +1,88 @@
+import hashlib
+import os
+
+import numpy as np
+
+CACHE_DIR = os.path.join(".cache", "elevation_grids")
+# Default disk budget for cached grids
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+class GridCache:
+    # Fetched elevation grids stored as .npy files keyed by source, bounding box
+    # and resolution. Reads are memory-mapped; file mtimes track recency so the
+    # least recently used grids are evicted once the disk budget is exceeded.
+    def __init__(self, directory=CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, bbox, resolution=None, source="bridges"):
+        text = f"{source}:" + ",".join(f"{v:.4f}" for v in bbox) + f"@{resolution}"
+        return hashlib.sha1(text.encode()).hexdigest()
+
+    def path(self, bbox, resolution=None, source="bridges"):
+        return os.path.join(self.directory, self.key(bbox, resolution, source) + ".npy")
+
+    def get(self, bbox, resolution=None, source="bridges"):
+        path = self.path(bbox, resolution, source)
+        try:
+            grid = np.load(path, mmap_mode="r")
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        # Touch the file so it counts as recently used
+        os.utime(path)
+        self.hits += 1
+        return grid
+
+    def put(self, bbox, grid, resolution=None, source="bridges"):
+        grid = np.asarray(grid)
+        # ETOPO1 elevations are whole meters within int16 range; store them compactly
+        if grid.size and np.all(grid == np.round(grid)) and grid.min() >= -32768 and grid.max() <= 32767:
+            grid = grid.astype(np.int16)
+        else:
+            grid = grid.astype(np.float32)
+
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path(bbox, resolution, source)
+        # Write then rename so readers never see a partial file
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.save(f, grid)
+        os.replace(tmp_path, path)
+        self.evict()
+
+    def entries(self):
+        if not os.path.isdir(self.directory):
+            return []
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".npy"):
+                stat = os.stat(os.path.join(self.directory, name))
+                entries.append((stat.st_mtime, stat.st_size, name))
+        return entries
+
+    def size_bytes(self):
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self):
+        # Drop least recently used grids until the cache fits the budget
+        entries = sorted(self.entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            total -= size
+
+    def clear(self):
+        for _, _, name in self.entries():
+            os.remove(os.path.join(self.directory, name))
+
+
+default_cache = GridCache()
@@ -1,30 +1,56 @@
-from bridges.bridges import Bridges
-from bridges.data_src_dependent import data_source
+from elevation_cache import default_cache
+from elevation_sources import BridgesSource
+from elevation_store import ElevationStore
+from tiled_fetch import PartialFetchError, TiledSource
+import numpy as np
 import random
 
-def get_elevation_grid(rows=10, cols=10):
-    # Set up BRIDGES connection
-    bridges = Bridges(0, "arionstern", "1435718270210")
+# Degrees between neighbouring grid points
+GRID_STEP = 0.1
 
-    #random starting point for the grid
-    lat = round(random.uniform(-89.0, 88.0), 2)
-    lon = round(random.uniform(-179.0, 178.0), 2)
+default_source = TiledSource(BridgesSource())
+
+
+def random_origin(seed=None):
+    # Random south-west corner for the grid; a seed makes it repeatable
+    rng = random.Random(seed)
+    lat = round(rng.uniform(-89.0, 88.0), 2)
+    lon = round(rng.uniform(-179.0, 178.0), 2)
+    return lat, lon
+
+
+def get_elevation_grid(rows=10, cols=10, origin=None, seed=None, cache=default_cache, source=None):
+    source = source or default_source
+
+    # Explicit (lat, lon) origin, or a random one (seedable so runs can hit the cache)
+    lat, lon = origin if origin is not None else random_origin(seed)
 
     min_lat = lat
-    max_lat = lat + (rows * 0.1)
+    max_lat = lat + (rows * GRID_STEP)
     min_lon = lon
-    max_lon = lon + (cols * 0.1)
+    max_lon = lon + (cols * GRID_STEP)
+    bbox = [min_lat, min_lon, max_lat, max_lon]
+
+    # Only remote sources are worth caching; local ones are already on disk or computed
+    use_cache = cache is not None and source.cacheable
 
     try:
-        # Fetch elevation data for the bounding box
-        elevation_obj = data_source.get_elevation_data([min_lat, min_lon, max_lat, max_lon])
-        grid = elevation_obj.data
-
-        result = []
-        for i in range(min(rows, len(grid))):
-            for j in range(min(cols, len(grid[0]))):
-                result.append((lat + i * 0.1, lon + j * 0.1, grid[i][j]))
-        return result
+        cells = cache.get(bbox, resolution=GRID_STEP, source=source.name) if use_cache else None
+        if cells is None:
+            try:
+                cells = source.fetch(lat, lon, rows, cols, GRID_STEP)
+            except PartialFetchError as e:
+                # Keep the tiles that arrived; partial grids are never cached
+                print(f"Partial elevation grid: {e}")
+                store = ElevationStore.from_grid(e.grid, lat, lon, GRID_STEP)
+                return store.subset(np.flatnonzero(~e.missing.ravel()))
+            if cells.size == 0:
+                return ElevationStore([], [], [])
+            if use_cache:
+                cache.put(bbox, cells, resolution=GRID_STEP, source=source.name)
+
+        # Keep the points as NumPy columns instead of one tuple per cell
+        return ElevationStore.from_grid(cells, lat, lon, GRID_STEP)
     except Exception as e:
         print(f"Failed to fetch elevation grid: {e}")
-        return []
+        return ElevationStore([], [], [])
@@ -0,0 +1,136 @@
+import os
+import random
+import threading
+import time
+
+import numpy as np
+
+from tiled_fetch import TiledSource
+
+# ETOPO1 grid-registered layout: 1 arc-minute cells, north-west corner at (90, -180)
+ETOPO1_SHAPE = (10801, 21601)
+ETOPO1_CELL_SIZE = 1.0 / 60.0
+
+
+class BridgesSource:
+    # NOAA ETOPO1 through the BRIDGES elevation service
+    name = "bridges"
+    cacheable = True
+    # The bridges client rewrites its on-disk LRU index and cache files with
+    # no locking of its own, so concurrent tiles would lose entries or read
+    # half-written files. Shared by every instance, since they share that cache.
+    _lock = threading.Lock()
+
+    def fetch(self, lat, lon, rows, cols, step):
+        # Imported here so offline sources work without the bridges package
+        from bridges.bridges import Bridges
+        from bridges.data_src_dependent import data_source
+
+        # Set up BRIDGES connection
+        bridges = Bridges(0, "arionstern", "1435718270210")
+
+        # Fetch elevation data for the bounding box
+        bbox = [lat, lon, lat + rows * step, lon + cols * step]
+        with self._lock:
+            elevation_obj = data_source.get_elevation_data(bbox, step)
+        grid = elevation_obj.data
+        return np.array([row[:cols] for row in grid[:rows]])
+
+
+class RasterSource:
+    # Local ETOPO-style raster (.npy or raw binary) read through a memory map,
+    # so only the rows and columns a window touches are ever paged in
+    cacheable = False
+
+    def __init__(self, path, shape=ETOPO1_SHAPE, dtype="<i2", north=90.0, west=-180.0, cell_size=ETOPO1_CELL_SIZE):
+        self.path = path
+        if path.endswith(".npy"):
+            self.raster = np.load(path, mmap_mode="r")
+        else:
+            self.raster = np.memmap(path, dtype=dtype, mode="r", shape=shape)
+        self.north = north
+        self.west = west
+        self.cell_size = cell_size
+        self.name = f"raster:{os.path.basename(path)}"
+
+    def fetch(self, lat, lon, rows, cols, step):
+        # Nearest raster cell for every grid point; raster rows run north to south
+        lats = lat + np.arange(rows) * step
+        lons = lon + np.arange(cols) * step
+        n_rows, n_cols = self.raster.shape
+        row_idx = np.clip(np.round((self.north - lats) / self.cell_size).astype(np.int64), 0, n_rows - 1)
+        col_idx = np.round((lons - self.west) / self.cell_size).astype(np.int64) % n_cols
+
+        # Slice the touched row band first so the gather stays inside it
+        top, bottom = row_idx.min(), row_idx.max() + 1
+        band = self.raster[top:bottom]
+        return np.asarray(band[(row_idx - top)[:, None], col_idx[None, :]])
+
+
+class SyntheticSource:
+    # Deterministic terrain for benchmarks and offline runs. Elevation is a fixed
+    # function of (lat, lon) for a given seed, so overlapping windows agree.
+    cacheable = False
+
+    def __init__(self, seed=0, octaves=6):
+        rng = np.random.default_rng(seed)
+        self.freq_lat = rng.uniform(0.05, 2.0, octaves) * 2.0 ** np.arange(octaves)
+        self.freq_lon = rng.uniform(0.05, 2.0, octaves) * 2.0 ** np.arange(octaves)
+        self.phase_lat = rng.uniform(0, 2 * np.pi, octaves)
+        self.phase_lon = rng.uniform(0, 2 * np.pi, octaves)
+        self.amplitude = 4000.0 / 1.8 ** np.arange(octaves)
+        self.name = f"synthetic:{seed}"
+
+    def fetch(self, lat, lon, rows, cols, step):
+        lats = np.radians(lat + np.arange(rows) * step)[:, None]
+        lons = np.radians(lon + np.arange(cols) * step)[None, :]
+        terrain = np.zeros((rows, cols))
+        for k in range(len(self.amplitude)):
+            terrain += self.amplitude[k] * (np.sin(self.freq_lat[k] * lats * 20 + self.phase_lat[k])
+                                            * np.cos(self.freq_lon[k] * lons * 20 + self.phase_lon[k]))
+        # Whole meters within the ETOPO1 range, like the real data
+        return np.clip(np.round(terrain), -11000, 9000).astype(np.int16)
+
+
+class FakeRemoteSource:
+    # Stand-in for a remote elevation service: synthetic terrain returned after
+    # a fixed per-request latency, with a share of requests failing at random.
+    # Tiled fetching, retries and throughput can be measured with it offline.
+    cacheable = False
+
+    def __init__(self, latency=0.05, failure_rate=0.0, seed=0):
+        self.terrain = SyntheticSource(seed)
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.rng = random.Random(seed)
+        self.name = f"fake:{latency:g}:{failure_rate:g}"
+
+    def fetch(self, lat, lon, rows, cols, step):
+        time.sleep(self.latency)
+        if self.rng.random() < self.failure_rate:
+            raise ConnectionError("simulated request failure")
+        return self.terrain.fetch(lat, lon, rows, cols, step)
+
+
+SOURCES = {
+    "bridges": BridgesSource,
+    "raster": RasterSource,
+    "synthetic": SyntheticSource,
+    "fake": FakeRemoteSource,
+}
+
+
+def get_source(spec="bridges"):
+    # "bridges", "synthetic[:seed]", "raster:<path>" or "fake[:latency[:failure_rate]]".
+    # Remote sources are fetched in concurrent tiles.
+    name, _, arg = spec.partition(":")
+    if name == "raster":
+        return RasterSource(arg)
+    if name == "synthetic":
+        return SyntheticSource(int(arg) if arg else 0)
+    if name == "bridges":
+        return TiledSource(BridgesSource())
+    if name == "fake":
+        latency, _, failure_rate = arg.partition(":")
+        return TiledSource(FakeRemoteSource(float(latency or 0.05), float(failure_rate or 0.0)))
+    raise ValueError(f"Unknown elevation source: {spec}")
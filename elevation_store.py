@@ -0,0 +1,113 @@
+import numpy as np
+
+SIGN_BIT = np.uint32(0x80000000)
+
+
+def pack_keys(elev, low):
+    # One uint64 per cell whose unsigned order matches (elev, low): the float32
+    # elevation bits go in the high word, flipped so negative values sort first,
+    # and `low` fills the low word. Adding +0.0 folds -0.0 into +0.0.
+    bits = (np.asarray(elev, dtype=np.float32) + np.float32(0.0)).view(np.uint32)
+    bits = np.where(bits & SIGN_BIT, ~bits, bits | SIGN_BIT)
+    return (bits.astype(np.uint64) << np.uint64(32)) | np.asarray(low).astype(np.uint32).astype(np.uint64)
+
+
+def unpack_keys(keys):
+    # Inverse of pack_keys: (float32 elevations, uint32 low words)
+    high = (keys >> np.uint64(32)).astype(np.uint32)
+    bits = np.where(high & SIGN_BIT, high ^ SIGN_BIT, ~high)
+    return bits.view(np.float32), (keys & np.uint64(0xFFFFFFFF)).astype(np.uint32)
+
+
+class PackedKeys(list):
+    # Packed sort keys as a plain list, so `keys.__getitem__` stays a C-level
+    # key function, that also keeps the uint64 array for sorts that look keys
+    # up in bulk with NumPy
+    def __init__(self, packed):
+        super().__init__(packed.tolist())
+        self.packed = packed
+
+
+class ElevationStore:
+    # Grid points kept as parallel NumPy columns (float32 lat/lon/elev, int32 idx).
+    # The display order is a permutation of cell numbers in `order`; sorting and
+    # shuffling only move those int32 entries, never the point data itself.
+    def __init__(self, lat, lon, elev, idx=None, order=None, rows=None, cols=None):
+        self.lat = np.asarray(lat, dtype=np.float32)
+        self.lon = np.asarray(lon, dtype=np.float32)
+        self.elev = np.asarray(elev, dtype=np.float32)
+        n = len(self.elev)
+        self.idx = np.arange(n, dtype=np.int32) if idx is None else np.asarray(idx, dtype=np.int32)
+        self.order = np.arange(n, dtype=np.int32) if order is None else order
+        self.rows = rows
+        self.cols = cols
+
+    @classmethod
+    def from_grid(cls, grid, lat0, lon0, step=0.1):
+        # Row-major cells starting at (lat0, lon0), step degrees apart
+        grid = np.asarray(grid, dtype=np.float32)
+        rows, cols = grid.shape
+        lat = np.repeat(lat0 + np.arange(rows) * step, cols)
+        lon = np.tile(lon0 + np.arange(cols) * step, rows)
+        return cls(lat, lon, grid.ravel(), rows=rows, cols=cols)
+
+    @classmethod
+    def from_points(cls, points, rows=None, cols=None):
+        # (lat, lon, elev) or (lat, lon, elev, idx) tuples
+        if not points:
+            return cls([], [], [], rows=rows, cols=cols)
+        columns = np.array(points, dtype=np.float64).reshape(len(points), -1)
+        idx = columns[:, 3] if columns.shape[1] > 3 else None
+        return cls(columns[:, 0], columns[:, 1], columns[:, 2], idx=idx, rows=rows, cols=cols)
+
+    def __len__(self):
+        return len(self.order)
+
+    def __getitem__(self, pos):
+        # Point at a display position, in the same (lat, lon, elev, idx) layout as before
+        return self.point(self.order[pos])
+
+    def point(self, cell):
+        # Point data of a cell number, wherever it currently sits in the order
+        return (float(self.lat[cell]), float(self.lon[cell]), float(self.elev[cell]), int(self.idx[cell]))
+
+    def __iter__(self):
+        for pos in range(len(self.order)):
+            yield self[pos]
+
+    def positions_of(self, cells):
+        # Current display positions of the given cell numbers
+        positions = np.empty(len(self.order), dtype=np.int64)
+        positions[self.order] = np.arange(len(self.order))
+        return positions[np.asarray(cells, dtype=np.int64)]
+
+    def elevations(self):
+        # Elevations in display order
+        return self.elev[self.order]
+
+    def grid(self):
+        # Elevations in display order, shaped like the original grid
+        return self.elevations().reshape((self.rows, self.cols))
+
+    def sort_key(self):
+        # Key function over cell numbers giving the same (elev, idx) ordering as
+        # stable_key, as one packed int per cell: comparing two of them is a
+        # single integer comparison instead of building and comparing tuples.
+        # idx is offset to start at 0 so negative values still fit the low word.
+        low = self.idx.astype(np.int64) - (int(self.idx.min()) if len(self.idx) else 0)
+        return PackedKeys(pack_keys(self.elev, low)).__getitem__
+
+    def subset(self, cells):
+        # Only the given cells, keeping their cell numbers as idx. The result
+        # is no longer a full grid, so rows and cols are dropped.
+        return ElevationStore(self.lat[cells], self.lon[cells], self.elev[cells], self.idx[cells])
+
+    def snapshot(self):
+        # Shares the point columns; only the permutation is copied
+        return ElevationStore(self.lat, self.lon, self.elev, self.idx, self.order.copy(), self.rows, self.cols)
+
+    def shuffle(self, rng=None):
+        (rng or np.random.default_rng()).shuffle(self.order)
+
+    def nbytes(self):
+        return self.lat.nbytes + self.lon.nbytes + self.elev.nbytes + self.idx.nbytes + self.order.nbytes
@@ -0,0 +1,196 @@
+import argparse
+import heapq
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from elevation_data import GRID_STEP
+from elevation_sources import get_source
+from elevation_store import pack_keys, unpack_keys
+
+DEFAULT_MEMORY_BUDGET = 64 * 1024 * 1024
+# Bytes of working memory per cell of a run: its uint64 key, plus the
+# elevation band and packing temporaries, fetched a quarter run at a time
+RUN_BYTES_PER_CELL = 32
+# Smallest per-run read buffer worth merging with; more runs than the budget
+# allows at this size are merged in several passes
+MIN_BLOCK_CELLS = 4096
+RANKING_DTYPE = np.dtype([("cell", "<u4"), ("elev", "<f4")])
+
+
+def grid_bands(source, lat, lon, rows, cols, step=GRID_STEP, band_cells=1 << 20):
+    # Stream a rows x cols grid from the source a band of whole rows at a time,
+    # yielding (first cell number, row-major float32 elevations)
+    band_rows = max(1, band_cells // max(1, cols))
+    for top in range(0, rows, band_rows):
+        count = min(band_rows, rows - top)
+        band = source.fetch(lat + top * step, lon, count, cols, step)
+        yield top * cols, np.asarray(band, dtype=np.float32).ravel()
+
+
+def write_runs(bands, directory, run_cells):
+    # Pack streamed cells into (elev, cell) keys and spill each full buffer
+    # to disk as one sorted run of raw uint64s
+    buffer = np.empty(run_cells, dtype=np.uint64)
+    filled = 0
+    paths = []
+
+    def flush():
+        run = buffer[:filled]
+        run.sort()
+        path = os.path.join(directory, f"run{len(paths):05d}.bin")
+        run.tofile(path)
+        paths.append(path)
+
+    for first, elevations in bands:
+        for start in range(0, len(elevations), run_cells):
+            piece = elevations[start:start + run_cells]
+            cells = np.arange(first + start, first + start + len(piece), dtype=np.uint64)
+            taken = min(len(piece), run_cells - filled)
+            buffer[filled:filled + taken] = pack_keys(piece[:taken], cells[:taken])
+            filled += taken
+            if filled == run_cells:
+                flush()
+                filled = 0
+            if taken < len(piece):
+                rest = len(piece) - taken
+                buffer[:rest] = pack_keys(piece[taken:], cells[taken:])
+                filled = rest
+    if filled:
+        flush()
+    return paths
+
+
+class RunReader:
+    # Sequential block reader over one sorted run file
+    def __init__(self, path, block_cells):
+        self.keys = np.memmap(path, dtype=np.uint64, mode="r")
+        self.block_cells = block_cells
+        self.position = 0
+        self.block = self.keys[:0]
+        self.refill()
+
+    def refill(self):
+        # Copy the next block out of the map so resident memory stays bounded
+        end = min(self.position + self.block_cells, len(self.keys))
+        self.block = np.array(self.keys[self.position:end])
+        self.position = end
+        return len(self.block) > 0
+
+    def take_through(self, bound):
+        # Remove and return the buffered keys <= bound
+        cut = np.searchsorted(self.block, bound, side="right")
+        taken, self.block = self.block[:cut], self.block[cut:]
+        return taken
+
+
+def merge_runs(paths, emit, block_cells):
+    # k-way merge of sorted runs. A heap orders the runs by the last key in
+    # their buffered block: every buffered key up to the smallest of those is
+    # final, so it is emitted in one vectorized step and only the run whose
+    # block ran out is refilled. Keys are unique (cell number in the low word),
+    # so exactly that run's block empties each round.
+    readers = [RunReader(path, block_cells) for path in paths]
+    heap = [(int(reader.block[-1]), i) for i, reader in enumerate(readers) if len(reader.block)]
+    heapq.heapify(heap)
+    rounds = 0
+    while heap:
+        bound, i = heapq.heappop(heap)
+        pieces = [taken for reader in readers if len(reader.block)
+                  for taken in (reader.take_through(bound),) if len(taken)]
+        merged = np.concatenate(pieces)
+        # The pieces are sorted runs, so the stable sort only merges them
+        merged.sort(kind="stable")
+        emit(merged)
+        rounds += 1
+        if readers[i].refill():
+            heapq.heappush(heap, (int(readers[i].block[-1]), i))
+    return rounds
+
+
+def _merge_to_file(paths, path, block_cells):
+    with open(path, "wb") as f:
+        return merge_runs(paths, lambda keys: keys.tofile(f), block_cells)
+
+
+def external_sort(source, lat, lon, rows, cols, output_path, step=GRID_STEP,
+                  memory_budget=DEFAULT_MEMORY_BUDGET, temp_dir=None):
+    # Rank every cell of a grid too large for memory by (elevation, cell number).
+    # The result is a memory-mapped .npy of (cell, elev) records in ascending order.
+    run_cells = max(MIN_BLOCK_CELLS, memory_budget // RUN_BYTES_PER_CELL)
+    # Each merge input and the output keep one block buffer (plus its sort copy)
+    max_fan_in = max(2, memory_budget // (MIN_BLOCK_CELLS * 8 * 3) - 1)
+    stats = {"cells": rows * cols, "memory_budget": memory_budget, "run_cells": run_cells}
+
+    directory = tempfile.mkdtemp(prefix="elevation_runs_", dir=temp_dir)
+    try:
+        start = time.perf_counter()
+        paths = write_runs(grid_bands(source, lat, lon, rows, cols, step, run_cells // 4), directory, run_cells)
+        stats["runs"] = len(paths)
+        stats["run_seconds"] = time.perf_counter() - start
+
+        # Merge in passes of at most max_fan_in runs until one final merge is left
+        start = time.perf_counter()
+        passes = 0
+        while len(paths) > max_fan_in:
+            block_cells = memory_budget // (8 * 3 * (max_fan_in + 1))
+            merged = []
+            for group in range(0, len(paths), max_fan_in):
+                path = os.path.join(directory, f"pass{passes}_{group:05d}.bin")
+                _merge_to_file(paths[group:group + max_fan_in], path, block_cells)
+                merged.append(path)
+            for path in paths:
+                os.remove(path)
+            paths = merged
+            passes += 1
+
+        ranking = np.lib.format.open_memmap(output_path, mode="w+", dtype=RANKING_DTYPE, shape=(rows * cols,))
+        written = 0
+
+        def emit(keys):
+            nonlocal written
+            elev, cells = unpack_keys(keys)
+            ranking["cell"][written:written + len(keys)] = cells
+            ranking["elev"][written:written + len(keys)] = elev
+            written += len(keys)
+
+        block_cells = max(1, memory_budget // (8 * 3 * (len(paths) + 1)))
+        stats["merge_rounds"] = merge_runs(paths, emit, block_cells) if paths else 0
+        stats["merge_passes"] = passes + 1
+        stats["block_cells"] = block_cells
+        stats["merge_seconds"] = time.perf_counter() - start
+        ranking.flush()
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    return ranking, stats
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Rank a large elevation grid out of core, within a memory budget.")
+    parser.add_argument("output", help="destination .npy for the (cell, elev) ranking")
+    parser.add_argument("--source", default="synthetic", help='"bridges", "synthetic[:seed]" or "raster:<path>"')
+    parser.add_argument("--lat", type=float, default=-60.0, help="south-west corner latitude")
+    parser.add_argument("--lon", type=float, default=-180.0, help="south-west corner longitude")
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--cols", type=int, default=1000)
+    parser.add_argument("--step", type=float, default=GRID_STEP, help="degrees between grid points")
+    parser.add_argument("--budget-mb", type=float, default=DEFAULT_MEMORY_BUDGET / 2 ** 20)
+    parser.add_argument("--temp-dir", help="where to write sorted runs (defaults to the system temp dir)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    _, stats = external_sort(get_source(args.source), args.lat, args.lon, args.rows, args.cols, args.output,
+                             args.step, int(args.budget_mb * 2 ** 20), args.temp_dir)
+    print(f"Ranked {stats['cells']} cells into {args.output}: {stats['runs']} runs in {stats['run_seconds']:.2f}s, "
+          f"{stats['merge_passes']} merge pass(es) in {stats['merge_seconds']:.2f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
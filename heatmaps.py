@@ -0,0 +1,98 @@
+import threading
+
+import numpy as np
+import pygame
+
+
+class HeatmapPanel:
+    # Before/after heatmaps of the grid drawn inside the pygame window. Each
+    # heatmap keeps a grid sampled down to its thumbnail size, and its surface
+    # is colored once per theme, so frames only blit cached surfaces.
+    def __init__(self, rect, labels=("Before", "After")):
+        self.rect = rect
+        self.labels = labels
+        self.visible = True
+        self.thumb_size = ((rect.width - 10 * (len(labels) - 1)) // len(labels), rect.height - 18)
+        self._grids = {}
+        self._surfaces = {}
+
+    def set(self, label, data):
+        # Sample the store's current display order; later changes to it don't affect the heatmap
+        if not data or not data.rows or not data.cols or len(data) != data.rows * data.cols:
+            self.clear(label)
+            return
+        width, height = self.thumb_size
+        grid = data.grid()
+        grid = grid[::max(1, data.rows // height), ::max(1, data.cols // width)]
+        self._grids[label] = (grid, float(data.elev.min()), float(data.elev.max()))
+        self._surfaces.pop(label, None)
+
+    def clear(self, label=None):
+        for name in [label] if label else list(self._grids):
+            self._grids.pop(name, None)
+            self._surfaces.pop(name, None)
+
+    def surface(self, label, color_theme, lut):
+        if label not in self._grids:
+            return None
+        cached = self._surfaces.get(label)
+        if cached is None or cached[0] != color_theme:
+            grid, low, high = self._grids[label]
+            norm = np.clip((grid - low) / (high - low if high != low else 1), 0.0, 1.0)
+            # Rows run south to north, so flip them to put north at the top;
+            # surfarray wants (x, y, rgb)
+            rgb = lut[(norm * (len(lut) - 1)).astype(np.int32)][::-1].transpose(1, 0, 2)
+            image = pygame.transform.scale(pygame.surfarray.make_surface(np.ascontiguousarray(rgb)), self.thumb_size)
+            cached = (color_theme, image)
+            self._surfaces[label] = cached
+        return cached[1]
+
+    def draw(self, screen, font, color_theme, lut):
+        # Returns the panel's rect when anything was drawn
+        if not self.visible or not self._grids:
+            return None
+        width, _ = self.thumb_size
+        for i, label in enumerate(self.labels):
+            image = self.surface(label, color_theme, lut)
+            if image is None:
+                continue
+            x = self.rect.x + i * (width + 10)
+            screen.blit(font.render(label, True, (255, 255, 255)), (x, self.rect.y))
+            screen.blit(image, (x, self.rect.y + 18))
+            pygame.draw.rect(screen, (200, 200, 200), (x, self.rect.y + 18, *self.thumb_size), 1)
+        return self.rect
+
+
+def save_comparison_heatmap(original_data, sorted_data, rows, cols, path):
+    # Full-resolution before/after figure rendered off-screen with matplotlib's
+    # Agg canvas, so it never opens a window or touches pyplot's global state
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=(12, 5))
+    FigureCanvasAgg(fig)
+    axes = fig.subplots(1, 2)
+    for ax, data, title in ((axes[0], original_data, "Original Elevation Grid"),
+                            (axes[1], sorted_data, "Sorted Elevation Grid")):
+        image = ax.imshow(data.elevations().reshape((rows, cols)), cmap="terrain", aspect="auto", origin="lower")
+        ax.set_title(title)
+        ax.set_xlabel("Columns")
+        ax.set_ylabel("Rows")
+        fig.colorbar(image, ax=ax, fraction=0.046, pad=0.04)
+    fig.tight_layout()
+    fig.savefig(path)
+    return path
+
+
+def export_comparison_heatmap(original_data, sorted_data, rows, cols, path):
+    # Write the PNG on a background thread so the render loop never waits on it
+    def export():
+        try:
+            save_comparison_heatmap(original_data, sorted_data, rows, cols, path)
+            print(f"Saved heatmaps to {path}")
+        except Exception as e:
+            print(f"Failed to export heatmaps: {e}")
+
+    thread = threading.Thread(target=export, daemon=True)
+    thread.start()
+    return thread
@@ -1,30 +1,114 @@
-from elevation_data import get_elevation_grid
-from sorting_visualizer import show_elevation_heatmap, run_visualizer
+import argparse
+import sys
 
-def main():
-    print("Fetching elevation data using BRIDGES...")
+from sort_algorithms import SORT_ALGORITHMS
+
+# Grid size used when none is given and there is no terminal to ask on
+DEFAULT_SIZE = 10
+# Color theme names, defined here so --help and headless runs never import
+# pygame; sorting_visualizer and sort_trace use this same list
+THEMES = ["terrain", "grayscale", "heat"]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Fetch an elevation grid and watch it being sorted.")
+    parser.add_argument("--rows", type=int, help="grid rows (asked for interactively if omitted)")
+    parser.add_argument("--cols", type=int, help="grid columns (asked for interactively if omitted)")
+    parser.add_argument("--algorithm", choices=list(SORT_ALGORITHMS), help="start this sort straight away")
+    parser.add_argument("--theme", default="terrain", choices=THEMES)
+    parser.add_argument("--race", nargs="+", choices=list(SORT_ALGORITHMS), metavar="ALGORITHM",
+                        help="race these sorts side by side on copies of the grid")
+    parser.add_argument("--source", default="bridges", help='"bridges", "synthetic[:seed]", "raster:<path>" or "fake[:latency[:failure_rate]]"')
+    parser.add_argument("--seed", type=int, help="seed for the grid origin, so runs are repeatable")
+    parser.add_argument("--headless", action="store_true",
+                        help="print the summary (and sort with --algorithm) without opening a window")
+    parser.add_argument("--record-dir", help="record each sort's steps to this directory for replay")
+    parser.add_argument("--profile", action="store_true", help="start with the profiling overlay on")
+    parser.add_argument("--trace", help="write a Chrome trace of the session to this file on exit")
+    return parser.parse_args(argv)
+
+
+def ask_size(args):
+    if args.rows and args.cols:
+        return args.rows, args.cols
+    if not sys.stdin.isatty():
+        return args.rows or DEFAULT_SIZE, args.cols or DEFAULT_SIZE
 
     try:
         # Prompt user for dataset size
-        rows = int(input("Enter number of grid rows: "))
-        cols = int(input("Enter number of grid columns: "))
+        rows = args.rows or int(input("Enter number of grid rows: "))
+        cols = args.cols or int(input("Enter number of grid columns: "))
     except ValueError:
         # Fallback to 10x10 if invalid input
-        rows, cols = 10, 10
+        rows, cols = DEFAULT_SIZE, DEFAULT_SIZE
         print("Invalid input. Using 10×10 grid.")
+    return rows, cols
+
+
+def run_headless(elevation_store, algorithm, record_dir=None):
+    # Summary and an optional full sort, with no pygame or matplotlib involved
+    import time
+
+    import numpy as np
 
+    from order_stats import summary_lines
+    from sort_algorithms import count_events, new_metrics
+
+    for line in summary_lines(elevation_store):
+        print(line)
+    if not algorithm:
+        return 0
+
+    data = elevation_store.snapshot()
+    metrics = new_metrics()
+    steps = SORT_ALGORITHMS[algorithm](data.order, metrics, key=data.sort_key())
+    recorder = None
+    if record_dir:
+        from sort_trace import TraceRecorder
+        recorder = TraceRecorder(data, algorithm)
+        steps = recorder.record(steps)
+    start = time.perf_counter()
+    count_events(steps, metrics)
+    elapsed = time.perf_counter() - start
+
+    if not np.array_equal(data.order, np.lexsort((data.idx, data.elev))):
+        print(f"{algorithm} sort produced unsorted output")
+        return 1
+    print(f"{algorithm}: {elapsed:.3f}s, {metrics['comparisons']} comparisons, "
+          f"{metrics['swaps']} swaps, {metrics['passes']} passes")
+    if recorder:
+        from sort_trace import save_recording
+        save_recording(recorder, metrics, record_dir)
+    return 0
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    rows, cols = ask_size(args)
+
+    # Data modules pull in NumPy; imported once the arguments are known to be valid
+    from elevation_data import get_elevation_grid
+    from elevation_sources import get_source
+
+    source = get_source(args.source)
+    print(f"Fetching elevation data from {source.name}...")
 
     # Fetch and visualize elevation data
-    elevation_list = get_elevation_grid(rows, cols)
-    if not elevation_list:
+    elevation_store = get_elevation_grid(rows, cols, seed=args.seed, source=source)
+    if not elevation_store:
         print("Failed to fetch elevation data.")
-        return
-    show_elevation_heatmap(elevation_list, rows, cols)
+        return 1
 
-    indexed = [(lat, lon, elev, idx) for idx, (lat, lon, elev) in enumerate(elevation_list)]
+    if args.headless:
+        return run_headless(elevation_store, args.algorithm, args.record_dir)
 
     # Launch Pygame visualizer
-    run_visualizer(indexed, default_sort_func=None, rows=rows, cols=cols)
+    from sorting_visualizer import run_visualizer
+    run_visualizer(elevation_store, default_sort_func=SORT_ALGORITHMS.get(args.algorithm), rows=rows, cols=cols,
+                   profile=args.profile, trace_path=args.trace, record_dir=args.record_dir,
+                   color_theme=args.theme, source=source, race=args.race)
+    return 0
+
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
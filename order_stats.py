@@ -0,0 +1,90 @@
+import numpy as np
+
+# Percentiles shown in the summary panel
+DEFAULT_PERCENTILES = (5, 25, 75, 95)
+HISTOGRAM_BINS = 32
+# Datasets whose statistics are kept, most recent last
+CACHE_SIZE = 8
+
+
+class OrderStatistics:
+    # Percentiles, extremes and a histogram of one grid's elevations, found by
+    # O(n) selection instead of a full sort. Ranks follow the (elev, idx) order
+    # of stable_key, so ties always resolve to the same cell. None of this
+    # depends on the display order, which is all a sort or shuffle changes.
+    def __init__(self, elev, idx, bins=HISTOGRAM_BINS):
+        self.elev = elev
+        self.idx = idx
+        self.count = len(elev)
+        self._cells = {}
+        if self.count:
+            self.histogram, self.bin_edges = np.histogram(elev, bins=bins)
+        else:
+            self.histogram, self.bin_edges = np.zeros(bins, dtype=np.int64), np.zeros(bins + 1)
+
+    def rank_of(self, percentile):
+        # Nearest-rank position, so the 50th percentile is element n // 2
+        return min(self.count - 1, int(percentile / 100 * self.count))
+
+    def select(self, rank):
+        # Cell holding the given rank in (elev, idx) order
+        if rank not in self._cells:
+            value = np.partition(self.elev, rank)[rank]
+            below = np.count_nonzero(self.elev < value)
+            ties = np.flatnonzero(self.elev == value)
+            offset = rank - below
+            self._cells[rank] = int(ties[np.argpartition(self.idx[ties], offset)[offset]])
+        return self._cells[rank]
+
+    def percentile_cell(self, percentile):
+        return self.select(self.rank_of(percentile))
+
+    def percentile(self, percentile):
+        return float(self.elev[self.percentile_cell(percentile)])
+
+    def lowest(self):
+        return self.percentile_cell(0)
+
+    def median(self):
+        return self.percentile_cell(50)
+
+    def highest(self):
+        return self.percentile_cell(100)
+
+
+_cache = []
+
+
+def order_statistics(data):
+    # Statistics for a store, shared by every snapshot of the same grid
+    if not _cache or _cache[-1][0] is not data.elev:
+        for i, (elev, stats) in enumerate(_cache):
+            if elev is data.elev:
+                _cache.append(_cache.pop(i))
+                break
+        else:
+            _cache.append((data.elev, OrderStatistics(data.elev, data.idx)))
+            del _cache[:-CACHE_SIZE]
+    return _cache[-1][1]
+
+
+def summary_lines(data, percentiles=DEFAULT_PERCENTILES):
+    # Lowest/median/highest points and the chosen percentiles, as panel text
+    if not data:
+        return []
+
+    # Selection finds each point in O(n); results are cached per grid, so
+    # shuffles and finished sorts of the same grid cost nothing
+    stats = order_statistics(data)
+    low = data.point(stats.lowest())
+    median = data.point(stats.median())
+    high = data.point(stats.highest())
+
+    lines = [
+        f"Lowest:  ({low[0]:.2f}, {low[1]:.2f}) → {low[2]:.2f} m",
+        f"Median:  ({median[0]:.2f}, {median[1]:.2f}) → {median[2]:.2f} m",
+        f"Highest: ({high[0]:.2f}, {high[1]:.2f}) → {high[2]:.2f} m"
+    ]
+    if percentiles:
+        lines.append("  ".join(f"p{p:g}: {stats.percentile(p):.0f} m" for p in percentiles))
+    return lines
@@ -0,0 +1,148 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from elevation_store import pack_keys
+
+# Below this many cells starting a process pool costs more than it saves
+MIN_PARALLEL_CELLS = 200_000
+# Splitter candidates taken from each sorted chunk
+OVERSAMPLE = 64
+LOW_WORD = np.uint64(0xFFFFFFFF)
+
+
+def _attach(name, n):
+    block = shared_memory.SharedMemory(name=name)
+    return block, np.ndarray((n,), dtype=np.uint64, buffer=block.buf)
+
+
+def _sort_chunk(name, n, start, end, samples):
+    # Worker: sort keys[start:end] in place and return evenly spaced samples of it
+    began = time.perf_counter()
+    block, keys = _attach(name, n)
+    chunk = keys[start:end]
+    chunk.sort()
+    picks = chunk[np.linspace(0, len(chunk) - 1, samples).astype(np.int64)].copy() if len(chunk) else chunk[:0].copy()
+    del keys, chunk
+    block.close()
+    return os.getpid(), time.perf_counter() - began, picks
+
+
+def _merge_bucket(src_name, dst_name, n, ranges, offset):
+    # Worker: merge this bucket's slice of every sorted chunk into keys_out[offset:].
+    # The slices are already sorted runs, so a stable (run-merging) sort of their
+    # concatenation does the k-way merge without a per-element Python heap.
+    began = time.perf_counter()
+    src_block, keys = _attach(src_name, n)
+    dst_block, out = _attach(dst_name, n)
+    merged = np.concatenate([keys[start:end] for start, end in ranges])
+    merged.sort(kind="stable")
+    out[offset:offset + len(merged)] = merged
+    del keys, out
+    src_block.close()
+    dst_block.close()
+    return os.getpid(), time.perf_counter() - began, len(merged)
+
+
+def _chunk_bounds(n, parts):
+    return (np.arange(parts + 1, dtype=np.int64) * n) // parts
+
+
+def _sample_sort(keys, workers):
+    # Sample sort across a process pool. Keys live in shared memory, so workers
+    # only receive block names and slice bounds, never the data itself.
+    n = len(keys)
+    per_worker = [{"worker": i} for i in range(workers)]
+    src = shared_memory.SharedMemory(create=True, size=keys.nbytes)
+    dst = shared_memory.SharedMemory(create=True, size=keys.nbytes)
+    try:
+        shared = np.ndarray((n,), dtype=np.uint64, buffer=src.buf)
+        shared[:] = keys
+        bounds = _chunk_bounds(n, workers)
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            # Phase 1: each worker sorts one contiguous chunk
+            began = time.perf_counter()
+            futures = [pool.submit(_sort_chunk, src.name, n, bounds[i], bounds[i + 1], OVERSAMPLE)
+                       for i in range(workers)]
+            samples = []
+            for stats, future in zip(per_worker, futures):
+                pid, seconds, picks = future.result()
+                stats.update(pid=pid, chunk=int(bounds[stats["worker"] + 1] - bounds[stats["worker"]]),
+                             sort_seconds=seconds)
+                samples.append(picks)
+            sort_seconds = time.perf_counter() - began
+
+            # Splitters at evenly spaced quantiles of the pooled samples
+            began = time.perf_counter()
+            pooled = np.sort(np.concatenate(samples))
+            splitters = pooled[(np.arange(1, workers) * len(pooled)) // workers]
+            cuts = [bounds[i] + np.concatenate(([0], np.searchsorted(shared[bounds[i]:bounds[i + 1]], splitters),
+                                                [bounds[i + 1] - bounds[i]]))
+                    for i in range(workers)]
+            ranges = [[(int(c[j]), int(c[j + 1])) for c in cuts] for j in range(workers)]
+            sizes = [sum(end - start for start, end in bucket) for bucket in ranges]
+            offsets = np.concatenate(([0], np.cumsum(sizes)))
+            split_seconds = time.perf_counter() - began
+
+            # Phase 2: each worker merges one key range into its final position
+            began = time.perf_counter()
+            futures = [pool.submit(_merge_bucket, src.name, dst.name, n, ranges[j], int(offsets[j]))
+                       for j in range(workers)]
+            for stats, future in zip(per_worker, futures):
+                pid, seconds, size = future.result()
+                stats.update(bucket=size, merge_seconds=seconds)
+            merge_seconds = time.perf_counter() - began
+
+        result = np.ndarray((n,), dtype=np.uint64, buffer=dst.buf).copy()
+        del shared
+    finally:
+        src.close()
+        src.unlink()
+        dst.close()
+        dst.unlink()
+
+    phases = {"sort_seconds": sort_seconds, "split_seconds": split_seconds, "merge_seconds": merge_seconds}
+    return result, phases, per_worker
+
+
+def parallel_sort(data, workers=None, min_cells=MIN_PARALLEL_CELLS):
+    # Sort an ElevationStore's order by (elev, idx) like stable_key, using up to
+    # `workers` processes. Returns wall-clock phase times and per-worker timing.
+    workers = max(1, workers or os.cpu_count() or 1)
+    n = len(data)
+    began = time.perf_counter()
+
+    # Low word of each key is a rank that breaks ties by idx, then by cell number
+    if n < 2 or np.all(data.idx[1:] >= data.idx[:-1]):
+        by_idx = None
+        keys = pack_keys(data.elev, np.arange(n))
+    else:
+        by_idx = np.argsort(data.idx, kind="stable")
+        keys = pack_keys(data.elev[by_idx], np.arange(n))
+    pack_seconds = time.perf_counter() - began
+
+    if workers == 1 or n < min_cells:
+        workers = 1
+        start = time.perf_counter()
+        keys.sort()
+        seconds = time.perf_counter() - start
+        phases = {"sort_seconds": seconds, "split_seconds": 0.0, "merge_seconds": 0.0}
+        per_worker = [{"worker": 0, "pid": os.getpid(), "chunk": n, "sort_seconds": seconds,
+                       "bucket": n, "merge_seconds": 0.0}]
+    else:
+        keys, phases, per_worker = _sample_sort(keys, workers)
+
+    cells = (keys & LOW_WORD).astype(np.int32)
+    data.order[:] = cells if by_idx is None else by_idx[cells]
+
+    stats = {"workers": workers, "cells": n, "pack_seconds": pack_seconds, **phases, "per_worker": per_worker}
+    stats["seconds"] = time.perf_counter() - began
+    # Share of the pool's time spent doing useful work in the two parallel phases
+    busy = sum(w["sort_seconds"] + w["merge_seconds"] for w in per_worker)
+    wall = phases["sort_seconds"] + phases["merge_seconds"]
+    stats["efficiency"] = busy / (wall * workers) if wall > 0 else 1.0
+    return stats
@@ -0,0 +1,63 @@
+import collections
+import queue
+import threading
+import time
+
+
+class GridPrefetcher:
+    # Fetches upcoming grids on background threads and keeps up to `depth`
+    # of them ready, so a reset can swap one in without waiting on the network
+    def __init__(self, fetch, depth=2, workers=1):
+        self.fetch = fetch
+        self.ready = queue.Queue(maxsize=depth)
+        self.latencies = collections.deque(maxlen=20)
+        self.failures = 0
+        self._stop = threading.Event()
+        self._threads = [threading.Thread(target=self._worker, daemon=True) for _ in range(workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def _timed_fetch(self):
+        start = time.perf_counter()
+        grid = self.fetch()
+        self.latencies.append(time.perf_counter() - start)
+        return grid
+
+    def _worker(self):
+        backoff = 1.0
+        while not self._stop.is_set():
+            grid = self._timed_fetch()
+            if not grid:
+                # Source is failing; back off instead of hammering it
+                self.failures += 1
+                self._stop.wait(backoff)
+                backoff = min(backoff * 2, 30.0)
+                continue
+            backoff = 1.0
+
+            # Block while the queue is full, waking up regularly to check for close()
+            while not self._stop.is_set():
+                try:
+                    self.ready.put(grid, timeout=0.25)
+                    break
+                except queue.Full:
+                    continue
+
+    def get(self):
+        # A preloaded grid, or None while the next one is still being fetched;
+        # never fetches on the caller's thread, which is the render loop
+        try:
+            return self.ready.get_nowait()
+        except queue.Empty:
+            return None
+
+    def stats(self):
+        last = self.latencies[-1] if self.latencies else None
+        average = sum(self.latencies) / len(self.latencies) if self.latencies else None
+        return {"ready": self.ready.qsize(), "depth": self.ready.maxsize,
+                "last_latency": last, "avg_latency": average, "failures": self.failures}
+
+    def close(self):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout=1.0)
@@ -0,0 +1,143 @@
+import bisect
+import collections
+import json
+import os
+import time
+
+# Where a frame's time goes, in the order the render loop spends it
+SECTIONS = ("events", "compute", "stats", "color", "draw", "flip", "wait")
+# Histogram bucket upper edges in seconds: 0.125 ms doubling up to about 1 s
+HISTOGRAM_EDGES = [0.000125 * 2 ** i for i in range(14)]
+# Frames kept for the overlay graph and rolling averages
+FRAME_HISTORY = 240
+# Trace events kept for export, roughly 20 minutes at 60 fps
+MAX_TRACE_EVENTS = 500_000
+# Chrome trace thread ids for frame sections and whole sorts
+FRAME_TID = 1
+SORT_TID = 2
+
+
+class FrameProfiler:
+    # Lap timer for the render loop. Each lap() charges the time since the
+    # previous lap to one section of the current frame, so the sections of a
+    # frame add up to its wall time. While disabled, begin_frame() leaves no
+    # frame open and every lap() returns straight away.
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.frames = collections.deque(maxlen=FRAME_HISTORY)
+        self.trace = collections.deque(maxlen=MAX_TRACE_EVENTS)
+        self.sorts = []
+        self.origin = time.perf_counter()
+        self._frame = None
+        self._frame_start = None
+        self._mark = None
+        self._sort = None
+        self.reset()
+
+    def reset(self):
+        self.totals = dict.fromkeys(SECTIONS, 0.0)
+        self.histograms = {name: [0] * (len(HISTOGRAM_EDGES) + 1) for name in SECTIONS + ("frame",)}
+        self.frame_count = 0
+
+    def toggle(self):
+        self.enabled = not self.enabled
+        return self.enabled
+
+    def begin_frame(self):
+        if not self.enabled:
+            self._frame = None
+            return
+        self._frame_start = self._mark = time.perf_counter()
+        self._frame = dict.fromkeys(SECTIONS, 0.0)
+
+    def lap(self, section):
+        # Charge the time since the last lap to `section`
+        if self._frame is None:
+            return
+        now = time.perf_counter()
+        self._frame[section] += now - self._mark
+        self._event(section, "frame", self._mark, now, FRAME_TID)
+        self._mark = now
+
+    def end_frame(self):
+        if self._frame is None:
+            return
+        now = time.perf_counter()
+        frame = self._frame
+        frame["frame"] = now - self._frame_start
+        for name, seconds in frame.items():
+            if name in self.totals:
+                self.totals[name] += seconds
+            if seconds:
+                self.histograms[name][bisect.bisect_left(HISTOGRAM_EDGES, seconds)] += 1
+        self.frame_count += 1
+        self.frames.append(frame)
+        self._event("frame", "frame", self._frame_start, now, FRAME_TID)
+        self._frame = None
+
+    def begin_sort(self, label):
+        # Per-sort totals are the difference of the running totals across the sort
+        if not self.enabled:
+            return
+        self.end_sort()
+        self._sort = (label, time.perf_counter(), dict(self.totals))
+
+    def end_sort(self, outcome="done"):
+        # Close the open sort span, if any, and return its section breakdown
+        if self._sort is None:
+            return None
+        label, start, before = self._sort
+        now = time.perf_counter()
+        summary = {"label": label, "outcome": outcome, "seconds": now - start,
+                   "sections": {name: self.totals[name] - before[name] for name in SECTIONS}}
+        self.sorts.append(summary)
+        self._event(label, "sort", start, now, SORT_TID, {"outcome": outcome})
+        self._sort = None
+        return summary
+
+    def _event(self, name, category, start, end, tid, args=None):
+        event = {"name": name, "cat": category, "ph": "X", "pid": os.getpid(), "tid": tid,
+                 "ts": (start - self.origin) * 1e6, "dur": (end - start) * 1e6}
+        if args:
+            event["args"] = args
+        self.trace.append(event)
+
+    def last_frame(self):
+        return self.frames[-1] if self.frames else None
+
+    def average(self, section):
+        # Rolling mean over the recent frames, in seconds
+        if not self.frames:
+            return 0.0
+        return sum(frame[section] for frame in self.frames) / len(self.frames)
+
+    def histogram(self, section):
+        # (upper edge in seconds, count) pairs; the last edge is None for overflow
+        return list(zip(HISTOGRAM_EDGES + [None], self.histograms[section]))
+
+    def export_trace(self, path):
+        # Chrome trace-event JSON, viewable in chrome://tracing or Perfetto
+        names = {FRAME_TID: "render loop", SORT_TID: "sorts"}
+        metadata = [{"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": tid, "args": {"name": name}}
+                    for tid, name in names.items()]
+        with open(path, "w") as f:
+            json.dump({"traceEvents": metadata + list(self.trace), "displayTimeUnit": "ms"}, f)
+        return len(self.trace)
+
+
+def format_sort_summary(summary):
+    parts = ", ".join(f"{name} {seconds:.2f}s" for name, seconds in summary["sections"].items() if seconds)
+    return f"{summary['label']} ({summary['outcome']}) {summary['seconds']:.2f}s: {parts}"
+
+
+def format_histogram(profiler, section):
+    lines = [f"{section} latency:"]
+    for edge, count in profiler.histogram(section):
+        if count:
+            bound = f"<= {edge * 1000:7.3f} ms" if edge is not None else f" > {HISTOGRAM_EDGES[-1] * 1000:7.3f} ms"
+            lines.append(f"  {bound}  {count}")
+    return "\n".join(lines)
+
+
+# Shared by the render loop and the drawing helpers it calls
+profiler = FrameProfiler()
@@ -0,0 +1,453 @@
+import collections
+import itertools
+import math
+import numbers
+import operator
+
+import numpy as np
+
+# Step event op codes yielded by every *_sort_steps generator.
+# Each event is a tuple (op, a, b): COMPARE and SWAP refer to positions a and b,
+# WRITE means position a was overwritten (b is unused and set to -1).
+# The generators don't count as they go: every comparison yields one COMPARE
+# and every move one SWAP or WRITE, so consumers that want the counts add up
+# op codes with count_events, and pure-throughput runs skip counting entirely.
+# `metrics` is only written for passes and may be None.
+COMPARE = 0
+SWAP = 1
+WRITE = 2
+
+# Radix sort digit size
+RADIX_BITS = 8
+RADIX = 1 << RADIX_BITS
+RADIX_MASK = RADIX - 1
+# Positions expanded per batch while radix sort writes a pass
+RADIX_WRITE_CHUNK = 4096
+# Partitions this small are finished with insertion sort in introsort
+INSERTION_THRESHOLD = 16
+# Op codes tallied per bytes() batch by count_events
+COUNT_CHUNK = 1 << 16
+
+
+def stable_key(item):
+    return (item[2], item[3]) if len(item) > 3 else (item[2], 0)
+
+
+def count_events(events, metrics):
+    # Add step events to the comparison and swap counters; consumes `events`
+    # if it is a generator. Op codes are packed into bytes and counted in C;
+    # anything that isn't a COMPARE is a SWAP or WRITE.
+    ops = map(operator.itemgetter(0), events)
+    while True:
+        codes = bytes(itertools.islice(ops, COUNT_CHUNK))
+        if not codes:
+            return metrics
+        compares = codes.count(COMPARE)
+        metrics["comparisons"] += compares
+        metrics["swaps"] += len(codes) - compares
+
+
+def event_indices(event):
+    op, a, b = event
+    return (a,) if op == WRITE else (a, b)
+
+
+def bubble_sort_steps(data, metrics, key=stable_key):
+    n = len(data)
+    for i in range(n):
+        for j in range(0, n - i - 1):
+            yield COMPARE, j, j + 1
+            if key(data[j]) > key(data[j + 1]):
+                if data[j] != data[j + 1]:
+                    data[j], data[j + 1] = data[j + 1], data[j]
+                    yield SWAP, j, j + 1
+
+
+def _partition(arr, low, high, key):
+    # Lomuto partition around arr[high]; returns the pivot's final position
+    pivot_key = key(arr[high])
+    i = low - 1
+    for j in range(low, high):
+        yield COMPARE, j, high
+        if key(arr[j]) < pivot_key:
+            i += 1
+            if arr[i] != arr[j]:
+                arr[i], arr[j] = arr[j], arr[i]
+                yield SWAP, i, j
+    if arr[i + 1] != arr[high]:
+        arr[i + 1], arr[high] = arr[high], arr[i + 1]
+        yield SWAP, i + 1, high
+    return i + 1
+
+
+def _merge(arr, l, m, r, key):
+    # Merge the sorted runs arr[l..m] and arr[m+1..r]
+    def write(k, value):
+        if arr[k] != value:
+            arr[k] = value
+            return True
+        return False
+
+    # list() so slices of array-backed sequences are copies, not views
+    left = list(arr[l:m + 1])
+    right = list(arr[m + 1:r + 1])
+    i = j = 0
+    k = l
+    while i < len(left) and j < len(right):
+        yield COMPARE, k, k
+        if key(left[i]) <= key(right[j]):
+            changed = write(k, left[i])
+            i += 1
+        else:
+            changed = write(k, right[j])
+            j += 1
+        if changed:
+            yield WRITE, k, -1
+        k += 1
+    while i < len(left):
+        if write(k, left[i]):
+            yield WRITE, k, -1
+        i += 1
+        k += 1
+    while j < len(right):
+        if write(k, right[j]):
+            yield WRITE, k, -1
+        j += 1
+        k += 1
+
+
+def _insertion_range(data, low, high, key, sorted_until=None):
+    # Insertion sort of data[low..high]; data[low:sorted_until] may already be sorted
+    for i in range(sorted_until or low + 1, high + 1):
+        item = data[i]
+        item_key = key(item)
+        j = i - 1
+        while j >= low:
+            yield COMPARE, j, j + 1
+            if key(data[j]) > item_key:
+                if data[j + 1] != data[j]:
+                    data[j + 1] = data[j]
+                    yield WRITE, j + 1, -1
+                j -= 1
+            else:
+                break
+        if data[j + 1] != item:
+            data[j + 1] = item
+            yield WRITE, j + 1, -1
+
+
+def _heap_range(data, low, high, key):
+    # Heap sort of data[low..high]; heap node i lives at position low + i
+    def heapify(arr, n, i):
+        # Iterative sift-down; same comparisons as the recursive version
+        while True:
+            largest = i
+            l = 2 * i + 1
+            r = 2 * i + 2
+            if l < n:
+                yield COMPARE, low + l, low + largest
+                if key(arr[low + l]) > key(arr[low + largest]):
+                    largest = l
+            if r < n:
+                yield COMPARE, low + r, low + largest
+                if key(arr[low + r]) > key(arr[low + largest]):
+                    largest = r
+            if largest == i:
+                return
+            if arr[low + i] != arr[low + largest]:
+                arr[low + i], arr[low + largest] = arr[low + largest], arr[low + i]
+                yield SWAP, low + i, low + largest
+            i = largest
+
+    n = high - low + 1
+    for i in range(n // 2 - 1, -1, -1):
+        yield from heapify(data, n, i)
+    for i in range(n - 1, 0, -1):
+        if data[low + i] != data[low]:
+            data[low + i], data[low] = data[low], data[low + i]
+            yield SWAP, low, low + i
+        yield from heapify(data, i, 0)
+
+
+def quick_sort_steps(data, metrics, key=stable_key):
+    # Explicit stack instead of recursion so sorted input can't blow the
+    # recursion limit; right half is pushed first so the left half runs first
+    stack = [(0, len(data) - 1)]
+    while stack:
+        low, high = stack.pop()
+        if low < high:
+            pi = yield from _partition(data, low, high, key)
+            stack.append((pi + 1, high))
+            stack.append((low, pi - 1))
+
+
+def merge_sort_steps(data, metrics, key=stable_key):
+    def merge_sort(arr, l, r):
+        if l < r:
+            m = (l + r) // 2
+            yield from merge_sort(arr, l, m)
+            yield from merge_sort(arr, m + 1, r)
+            yield from _merge(arr, l, m, r, key)
+
+    yield from merge_sort(data, 0, len(data) - 1)
+
+
+def insertion_sort_steps(data, metrics, key=stable_key):
+    yield from _insertion_range(data, 0, len(data) - 1, key)
+
+
+def selection_sort_steps(data, metrics, key=stable_key):
+    n = len(data)
+    for i in range(n):
+        min_idx = i
+        min_key = key(data[i])
+        for j in range(i + 1, n):
+            yield COMPARE, j, min_idx
+            j_key = key(data[j])
+            if j_key < min_key:
+                min_idx = j
+                min_key = j_key
+        if i != min_idx and data[i] != data[min_idx]:
+            data[i], data[min_idx] = data[min_idx], data[i]
+            yield SWAP, i, min_idx
+
+
+def heap_sort_steps(data, metrics, key=stable_key):
+    yield from _heap_range(data, 0, len(data) - 1, key)
+
+
+def _radix_keys(keys):
+    # One non-negative uint64 per item. (elev, idx) tuple keys are combined
+    # into such an integer so the result matches the comparison sorts; integer
+    # keys, like ElevationStore.sort_key's packed ones, already order that way
+    # and are used as they are. The key types are checked as a set because
+    # NumPy would quietly truncate floats and wrap negative NumPy ints.
+    types = set(map(type, keys))
+    if types == {int}:
+        try:
+            return np.fromiter(keys, dtype=np.uint64, count=len(keys))
+        except OverflowError:
+            pass
+    elif all(issubclass(t, numbers.Integral) for t in types):
+        return _radix_keys([int(k) for k in keys])
+    elif all(issubclass(t, tuple) for t in types):
+        elevations = np.array([k[0] for k in keys])
+        indices = np.array([k[1] for k in keys], dtype=np.int64)
+        if elevations.dtype.kind in "iu" or np.all(elevations == np.floor(elevations)):
+            # ETOPO1 elevations are whole meters, so offsets from the minimum are dense ranks
+            ranks = (elevations - elevations.min()).astype(np.uint64)
+        else:
+            ranks = np.unique(elevations, return_inverse=True)[1].astype(np.uint64)
+        low = (indices - indices.min()).astype(np.uint64)
+        return ranks * (low.max() + np.uint64(1)) + low
+    raise TypeError("radix sort needs (elev, idx) tuple keys or non-negative integer keys")
+
+
+def radix_sort_steps(data, metrics, key=stable_key):
+    # LSD radix sort on one non-negative integer per item. No comparisons;
+    # each pass places items straight into their new positions. Keys, digit
+    # counts and each pass's new order come from NumPy, so between yields the
+    # only per-item Python work is the writes, which keeps large grids from
+    # stalling the frames that start a pass.
+    n = len(data)
+    if n < 2:
+        return
+    # ElevationStore.sort_key's keys carry their uint64 array, so they are
+    # looked up in one step instead of one key() call per item
+    packed = getattr(getattr(key, "__self__", None), "packed", None)
+    if packed is not None:
+        composite = packed[np.asarray(data)]
+    else:
+        composite = _radix_keys(list(map(key, data)))
+    items = data.copy() if isinstance(data, np.ndarray) else list(data)
+    # Which snapshot item sits at each position
+    placed = np.arange(n, dtype=np.int32 if n < 1 << 31 else np.int64)
+    max_key = int(composite.max())
+    shift = 0
+    while True:
+        digits = ((composite >> np.uint64(shift)) & np.uint64(RADIX_MASK)).astype(np.uint8)
+        counts = np.bincount(digits, minlength=RADIX)
+
+        # A digit shared by every item can't change the order
+        if counts.max() < n:
+            if metrics is not None:
+                metrics["passes"] += 1
+            order = np.argsort(digits, kind="stable")
+            moved = placed[order]
+            # Positions whose item changes, found and expanded to Python ints
+            # a chunk at a time rather than all at once
+            for start in range(0, n, RADIX_WRITE_CHUNK):
+                end = start + RADIX_WRITE_CHUNK
+                positions = np.flatnonzero(moved[start:end] != placed[start:end]) + start
+                sources = moved[positions]
+                if isinstance(items, np.ndarray):
+                    batch = items[sources].tolist()
+                else:
+                    batch = [items[source] for source in sources.tolist()]
+                for pos, item in zip(positions.tolist(), batch):
+                    if data[pos] != item:
+                        data[pos] = item
+                        yield WRITE, pos, -1
+            placed = moved
+            composite = composite[order]
+
+        shift += RADIX_BITS
+        if max_key >> shift == 0:
+            return
+
+
+def intro_sort_steps(data, metrics, key=stable_key):
+    # Quicksort with median-of-three pivots that switches to heap sort past
+    # 2*log2(n) levels and to insertion sort on small partitions
+    n = len(data)
+    if n < 2:
+        return
+    stack = [(0, n - 1, 2 * int(math.log2(n)))]
+    while stack:
+        low, high, depth = stack.pop()
+        if high - low + 1 <= INSERTION_THRESHOLD:
+            yield from _insertion_range(data, low, high, key)
+            continue
+        if depth == 0:
+            yield from _heap_range(data, low, high, key)
+            continue
+
+        # Move the median of the first, middle and last items into the pivot slot
+        mid = (low + high) // 2
+        for a, b in ((low, mid), (mid, high), (low, mid)):
+            yield COMPARE, a, b
+            if key(data[a]) > key(data[b]):
+                data[a], data[b] = data[b], data[a]
+                yield SWAP, a, b
+        data[mid], data[high] = data[high], data[mid]
+        yield SWAP, mid, high
+
+        pi = yield from _partition(data, low, high, key)
+        stack.append((pi + 1, high, depth - 1))
+        stack.append((low, pi - 1, depth - 1))
+
+
+def _min_run(n):
+    # Same rule as CPython's list.sort: a run length in [32, 64] so n / minrun
+    # is a power of two or just under one
+    extra = 0
+    while n >= 64:
+        extra |= n & 1
+        n >>= 1
+    return n + extra
+
+
+def tim_sort_steps(data, metrics, key=stable_key):
+    # Timsort-style: find natural runs (reversing strictly descending ones),
+    # extend short runs to minrun with insertion sort, and merge runs from a
+    # stack that keeps run lengths balanced
+    n = len(data)
+    if n < 2:
+        return
+    min_run = _min_run(n)
+    runs = []
+
+    def merge_at(i):
+        start, length = runs[i]
+        _, next_length = runs[i + 1]
+        runs[i] = (start, length + next_length)
+        del runs[i + 1]
+        if metrics is not None:
+            metrics["passes"] += 1
+        yield from _merge(data, start, start + length - 1, start + length + next_length - 1, key)
+
+    start = 0
+    while start < n:
+        end = start + 1
+        if end < n:
+            yield COMPARE, start, end
+            descending = key(data[end]) < key(data[start])
+            end += 1
+            while end < n:
+                yield COMPARE, end - 1, end
+                if (key(data[end]) < key(data[end - 1])) != descending:
+                    break
+                end += 1
+            if descending:
+                i, j = start, end - 1
+                while i < j:
+                    data[i], data[j] = data[j], data[i]
+                    yield SWAP, i, j
+                    i += 1
+                    j -= 1
+
+        # Extend short runs to minrun; the first end - start items are already sorted
+        run_end = min(n, start + min_run)
+        if end < run_end:
+            yield from _insertion_range(data, start, run_end - 1, key, sorted_until=end)
+            end = run_end
+        runs.append((start, end - start))
+        start = end
+
+        # Keep run lengths balanced so merges stay close to n log n
+        while len(runs) > 1:
+            i = len(runs) - 2
+            if (i > 0 and runs[i - 1][1] <= runs[i][1] + runs[i + 1][1]) or \
+                    (i > 1 and runs[i - 2][1] <= runs[i - 1][1] + runs[i][1]):
+                if runs[i - 1][1] < runs[i + 1][1]:
+                    i -= 1
+                yield from merge_at(i)
+            elif runs[i][1] <= runs[i + 1][1]:
+                yield from merge_at(i)
+            else:
+                break
+
+    while len(runs) > 1:
+        yield from merge_at(len(runs) - 2)
+
+
+# Display name -> step generator, in button order
+SORT_ALGORITHMS = {
+    "Quick": quick_sort_steps,
+    "Merge": merge_sort_steps,
+    "Insertion": insertion_sort_steps,
+    "Selection": selection_sort_steps,
+    "Heap": heap_sort_steps,
+    "Bubble": bubble_sort_steps,
+    "Radix": radix_sort_steps,
+    "Intro": intro_sort_steps,
+    "Tim": tim_sort_steps,
+}
+
+# Rough number of events each generator yields for n items, used to pace animations
+_STEP_ESTIMATES = {
+    bubble_sort_steps: lambda n: 0.75 * n * n,
+    insertion_sort_steps: lambda n: 0.5 * n * n,
+    selection_sort_steps: lambda n: 0.5 * n * n,
+    merge_sort_steps: lambda n: 2 * n * math.log2(n),
+    quick_sort_steps: lambda n: 1.5 * n * math.log2(n),
+    heap_sort_steps: lambda n: 2.5 * n * math.log2(n),
+    radix_sort_steps: lambda n: 4 * n,
+    intro_sort_steps: lambda n: 1.8 * n * math.log2(n),
+    tim_sort_steps: lambda n: 3 * n * math.log2(n),
+}
+
+
+def estimate_step_count(sort_steps, n):
+    if n < 2:
+        return 1
+    return max(1, int(_STEP_ESTIMATES.get(sort_steps, lambda m: m * math.log2(m))(n)))
+
+
+def new_metrics():
+    return {"comparisons": 0, "swaps": 0, "passes": 0}
+
+
+def run_sort(sort_steps, data, metrics, key=stable_key):
+    # Drain the generator at full speed with no rendering; with metrics=None
+    # nothing is counted, and the sorted result is the same. Array-backed data
+    # is sorted as a list, whose items index without boxing, then copied back.
+    items = data.tolist() if hasattr(data, "tolist") else data
+    steps = sort_steps(items, metrics, key=key)
+    if metrics is None:
+        collections.deque(steps, maxlen=0)
+    else:
+        count_events(steps, metrics)
+    if items is not data:
+        data[:] = items
+    return metrics
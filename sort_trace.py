@@ -0,0 +1,248 @@
+import argparse
+import array
+import itertools
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+from animation import StepScheduler
+from elevation_store import ElevationStore
+from main import THEMES
+from sort_algorithms import COMPARE, SWAP, WRITE, event_indices
+
+TRACE_VERSION = 1
+# One packed 9-byte record per step event. WRITE events keep the cell number
+# written in `b`, so a trace replays without re-running the algorithm.
+EVENT_DTYPE = np.dtype([("op", "u1"), ("a", "<i4"), ("b", "<i4")])
+# Fewest events between stored copies of the order. Large grids space their
+# checkpoints out to n events, so checkpoints cost about 4 bytes per event.
+MIN_CHECKPOINT_INTERVAL = 4096
+
+
+class TraceRecorder:
+    # Wraps a sort's step generator and captures every event it yields,
+    # plus a copy of the order every `interval` events
+    def __init__(self, data, algorithm):
+        self.data = data
+        self.algorithm = algorithm
+        self.interval = max(MIN_CHECKPOINT_INTERVAL, len(data))
+        self.ops = array.array("B")
+        self.first = array.array("i")
+        self.second = array.array("i")
+        # checkpoints[k] is the order after k * interval events
+        self.checkpoints = [data.order.copy()]
+
+    def record(self, steps):
+        order = self.data.order
+        for event in steps:
+            op, a, b = event
+            # The generator has already applied the event, so order[a] is the written cell
+            if op == WRITE:
+                b = int(order[a])
+            self.ops.append(op)
+            self.first.append(a)
+            self.second.append(b)
+            if len(self.ops) % self.interval == 0:
+                self.checkpoints.append(order.copy())
+            yield event
+
+    def trace(self, metrics=None):
+        events = np.empty(len(self.ops), dtype=EVENT_DTYPE)
+        events["op"] = np.frombuffer(self.ops, dtype=np.uint8)
+        events["a"] = np.frombuffer(self.first, dtype=np.int32)
+        events["b"] = np.frombuffer(self.second, dtype=np.int32)
+        data = self.data
+        return SortTrace(data.lat, data.lon, data.elev, data.idx, data.rows, data.cols, events,
+                         np.stack(self.checkpoints), self.interval, self.algorithm, dict(metrics or {}))
+
+
+class SortTrace:
+    # A recorded sort: the grid, its starting order, the event stream and checkpoints
+    def __init__(self, lat, lon, elev, idx, rows, cols, events, checkpoints, interval, algorithm, metrics):
+        self.lat = lat
+        self.lon = lon
+        self.elev = elev
+        self.idx = idx
+        self.rows = rows
+        self.cols = cols
+        self.events = events
+        self.checkpoints = checkpoints
+        self.interval = interval
+        self.algorithm = algorithm
+        self.metrics = metrics
+
+    def __len__(self):
+        return len(self.events)
+
+    def store(self):
+        # Fresh store in the pre-sort order
+        return ElevationStore(self.lat, self.lon, self.elev, self.idx, self.checkpoints[0].copy(), self.rows, self.cols)
+
+    def save(self, path, exclusive=False):
+        # exclusive raises FileExistsError instead of replacing an existing file
+        meta = {"version": TRACE_VERSION, "algorithm": self.algorithm, "rows": self.rows, "cols": self.cols,
+                "interval": self.interval, "metrics": self.metrics}
+        with open(path, "xb" if exclusive else "wb") as f:
+            np.savez(f, lat=self.lat, lon=self.lon, elev=self.elev, idx=self.idx, events=self.events,
+                     checkpoints=self.checkpoints, meta=np.array(json.dumps(meta)))
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as f:
+            meta = json.loads(str(f["meta"]))
+            if meta["version"] != TRACE_VERSION:
+                raise ValueError(f"Unsupported trace version {meta['version']} in {path}")
+            return cls(f["lat"], f["lon"], f["elev"], f["idx"], meta["rows"], meta["cols"], f["events"],
+                       f["checkpoints"], meta["interval"], meta["algorithm"], meta["metrics"])
+
+
+class ReplayRun:
+    # Plays a SortTrace back with the same interface as SortRun, plus seeking.
+    # Forward play applies recorded events; seeking restores the nearest
+    # checkpoint at or before the target and applies events from there.
+    def __init__(self, trace, target_seconds=20.0, fps=60):
+        self.trace = trace
+        self.data = trace.store()
+        self.ops = trace.events["op"]
+        self.first = trace.events["a"]
+        self.second = trace.events["b"]
+        self.target_seconds = target_seconds
+        self.fps = fps
+        self.position = 0
+        self.metrics = {"comparisons": 0, "swaps": 0, "passes": 0}
+        self.highlight = ()
+        self.compute_time = 0.0
+        self.scheduler = StepScheduler(self._play(), len(trace), target_seconds, fps)
+
+    def __len__(self):
+        return len(self.trace)
+
+    @property
+    def done(self):
+        return self.position >= len(self.trace)
+
+    @property
+    def paused(self):
+        return self.scheduler.paused_at is not None
+
+    def _apply(self, position):
+        op, a, b = int(self.ops[position]), int(self.first[position]), int(self.second[position])
+        order = self.data.order
+        if op == SWAP:
+            order[a], order[b] = order[b], order[a]
+            self.metrics["swaps"] += 1
+        elif op == WRITE:
+            order[a] = b
+            self.metrics["swaps"] += 1
+            b = -1
+        else:
+            self.metrics["comparisons"] += 1
+        return op, a, b
+
+    def _play(self):
+        # Reads self.position on every step, so seeks take effect immediately
+        while self.position < len(self.trace):
+            event = self._apply(self.position)
+            self.position += 1
+            if self.done:
+                self.metrics["passes"] = self.trace.metrics.get("passes", 0)
+            yield event
+
+    def advance(self):
+        if self.paused or self.done:
+            return []
+        return self._record(self.scheduler.advance())
+
+    def single_step(self):
+        return self._record(self.scheduler.step(1)) if not self.done else []
+
+    def _record(self, events):
+        if events:
+            self.highlight = event_indices(events[-1])
+        return events
+
+    def seek(self, step):
+        # Jump to just after `step` events; returns the new position
+        step = max(0, min(int(step), len(self.trace)))
+        if step < self.position:
+            checkpoint = step // self.trace.interval
+            self.data.order[:] = self.trace.checkpoints[checkpoint]
+            self.position = checkpoint * self.trace.interval
+            # Counts up to the checkpoint follow from the op codes alone
+            counts = np.bincount(self.ops[:self.position], minlength=3)
+            self.metrics["comparisons"] = int(counts[COMPARE])
+            self.metrics["swaps"] = int(counts[SWAP] + counts[WRITE])
+        last = None
+        while self.position < step:
+            last = self._apply(self.position)
+            self.position += 1
+        self.metrics["passes"] = self.trace.metrics.get("passes", 0) if self.done else 0
+        if last is None and step > 0:
+            op, a, b = int(self.ops[step - 1]), int(self.first[step - 1]), int(self.second[step - 1])
+            last = (op, a, -1 if op == WRITE else b)
+        self.highlight = event_indices(last) if last else ()
+
+        # Restart pacing from the new position, keeping speed and pause state
+        speed, paused = self.scheduler.speed, self.paused
+        self.scheduler = StepScheduler(self._play(), len(self.trace), self.target_seconds, self.fps)
+        self.scheduler.applied = self.position
+        self.scheduler.speed = speed
+        if paused:
+            self.scheduler.pause()
+        return self.position
+
+    def toggle_pause(self):
+        if self.paused:
+            self.scheduler.resume()
+        else:
+            self.scheduler.pause()
+
+    def elapsed(self):
+        return self.scheduler.elapsed()
+
+
+def save_recording(recorder, metrics, directory):
+    # Save a finished recording as <algorithm>-<timestamp>.npz in directory.
+    # Sorts finishing within the same second get -2, -3, ... suffixes rather
+    # than overwriting each other.
+    os.makedirs(directory, exist_ok=True)
+    stem = os.path.join(directory, f"{recorder.algorithm.lower()}-{time.strftime('%Y%m%d-%H%M%S')}")
+    trace = recorder.trace(metrics)
+    for attempt in itertools.count(1):
+        path = f"{stem}.npz" if attempt == 1 else f"{stem}-{attempt}.npz"
+        try:
+            trace.save(path, exclusive=True)
+            break
+        except FileExistsError:
+            continue
+    print(f"Saved {len(recorder.ops)} sort steps to {path}")
+    return path
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Replay a recorded sort trace, or export it as video frames.")
+    parser.add_argument("trace", help=".npz trace written by the visualizer")
+    parser.add_argument("--export", metavar="DIR", help="write PNG frames here instead of opening a window")
+    parser.add_argument("--frames", type=int, help="number of frames to export (default: one animation's worth)")
+    parser.add_argument("--theme", default="terrain", choices=THEMES)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    # Imported here so loading and inspecting traces doesn't need pygame
+    import sorting_visualizer
+
+    if args.export:
+        count = sorting_visualizer.export_replay_frames(args.trace, args.export, args.frames, args.theme)
+        print(f"Wrote {count} frames to {args.export}")
+    else:
+        sorting_visualizer.run_replay(args.trace, args.theme)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,90 +1,189 @@
-import pygame
+import functools
+import math
+import os
 import time
-import matplotlib.pyplot as plt
+import pygame
 import numpy as np
 from elevation_data import get_elevation_grid
+from animation import Race, SortRun
+from column_stats import ColumnStats
+from heatmaps import HeatmapPanel, export_comparison_heatmap
+from main import THEMES
+from prefetch import GridPrefetcher
+from profiling import FRAME_HISTORY, SECTIONS, format_histogram, format_sort_summary, profiler
+from order_stats import DEFAULT_PERCENTILES, order_statistics, summary_lines
+from sort_algorithms import SORT_ALGORITHMS, SWAP, WRITE, new_metrics
+from ui_cache import CachedFont, SurfaceCache
 
 WIDTH = 800
 HEIGHT = 600
 BAR_WIDTH = 5
 FPS = 60
+# Target wall-clock length of a sort animation, whatever the grid size
+ANIMATION_SECONDS = 20
+# Entries per theme color lookup table
+LUT_SIZE = 256
+COLOR_THEMES = THEMES
+# Grids kept preloaded for the next reset
+PREFETCH_DEPTH = 2
+# Legend gradient, and the area its labels and gradient cover on top of the bars
+LEGEND_RECT = pygame.Rect(10, HEIGHT - 30, 200, 10)
+LEGEND_AREA = pygame.Rect(10, HEIGHT - 45, 210, 25)
+# Percentiles listed under the min/median/max summary, and the histogram beside it
+SUMMARY_PERCENTILES = DEFAULT_PERCENTILES
+SUMMARY_HISTOGRAM_RECT = pygame.Rect(330, 55, 160, 50)
+# Before/after heatmap thumbnails, and where E exports full-size ones
+HEATMAP_PANEL = pygame.Rect(WIDTH - 260, HEIGHT - 190, 250, 110)
+HEATMAP_DIR = "heatmaps"
+# Default Chrome trace file written by T or on exit while profiling
+PROFILE_TRACE_PATH = "profile_trace.json"
+# Frame-time overlay placement; the graph spans two frame budgets vertically
+PROFILE_OVERLAY = pygame.Rect(WIDTH - 250, 75, 240, 190)
+PROFILE_GRAPH_HEIGHT = 40
+# Where recorded sort traces are saved
+TRACE_DIR = "traces"
+# Replay progress bar; clicking or dragging on it seeks
+REPLAY_BAR = pygame.Rect(10, 42, WIDTH - 20, 6)
+FOOTER = ("R = Reset | S = Shuffle | C = Theme | Space = Pause | N = Step | X = Cancel | +/- = Speed | "
+          "H/E = Heatmaps | P = Profile | W = Record | A = Race | ESC = Quit")
+# Race mode tiles its lanes over this area; each lane has a header for its counters
+RACE_AREA = pygame.Rect(0, 45, WIDTH, HEIGHT - 95)
+RACE_LANE_HEADER = 34
+# Sorts raced when none were picked with right-click
+RACE_DEFAULT = ("Quick", "Merge", "Heap", "Intro")
+RACE_FOOTER = ("Right-click buttons = Pick racers | A = Restart race | Space = Pause | N = Step | +/- = Speed | "
+               "C = Theme | X = Leave race | ESC = Quit")
+REPLAY_FOOTER = ("Space = Pause | Left/Right = Step | PgUp/PgDn = Jump | Home/End | +/- = Speed | "
+                 "C = Theme | Click bar = Seek | ESC = Quit")
+
+def build_color_lut(color_theme, size=LUT_SIZE):
+    # RGB table indexed by normalized elevation * (size - 1)
+    norm = np.linspace(0.0, 1.0, size)
+    if color_theme == "terrain":
+        red = 255 * norm
+        green = 255 * (1 - np.abs(norm - 0.5) * 2)
+        blue = 255 * (1 - norm)
+        lut = np.stack([red, green, blue], axis=1)
+    elif color_theme == "grayscale":
+        lut = np.repeat((255 * norm)[:, None], 3, axis=1)
+    elif color_theme == "heat":
+        # Only the heat theme needs a matplotlib colormap
+        from matplotlib import colormaps
+        lut = colormaps["inferno"](norm)[:, :3] * 255
+    else:
+        lut = np.full((size, 3), 255.0)
+    return lut.astype(np.uint8)
+
+
+_color_luts = {}
+
+
+def get_color_lut(color_theme):
+    # Built once per theme, then reused every frame
+    if color_theme not in _color_luts:
+        _color_luts[color_theme] = build_color_lut(color_theme)
+    return _color_luts[color_theme]
+
+
+def map_colors(surface, colors):
+    # Pack RGB rows into the surface's native pixel format for pixels2d writes
+    r_shift, g_shift, b_shift, _ = surface.get_shifts()
+    colors = colors.astype(np.uint32)
+    return (colors[:, 0] << r_shift) | (colors[:, 1] << g_shift) | (colors[:, 2] << b_shift)
+
+
+def column_shades(columns, which, min_elev, max_elev, lut, height=HEIGHT):
+    # Heights of the min/mean/max envelope for the given columns, and the
+    # LUT color of each column's mean elevation
+    elev_range = max_elev - min_elev if max_elev != min_elev else 1
+    heights = []
+    for values in (columns.min, columns.mean, columns.max):
+        norm = np.clip((values[which] - min_elev) / elev_range, 0.0, 1.0)
+        heights.append((norm * height).astype(np.int32))
+    norm_mean = np.clip((columns.mean[which] - min_elev) / elev_range, 0.0, 1.0)
+    colors = lut[(norm_mean * (len(lut) - 1)).astype(np.int32)]
+    return heights, colors
+
 
-def draw_bars(screen, data, font, highlight=[], min_elev=None, max_elev=None, hover_index=None, color_theme="terrain"):
+def envelope_tones(colors):
+    # Solid up to the bucket minimum, dimmer up to the mean, dimmest up to the max
+    wide = colors.astype(np.uint16)
+    return colors, (wide * 3 // 4).astype(np.uint8), (wide * 2 // 5).astype(np.uint8)
+
+
+def draw_bars(screen, data, font, highlight=[], min_elev=None, max_elev=None, hover_index=None, color_theme="terrain", columns=None,
+              legend=True):
     # Clear the screen
     screen.fill((0, 0, 0))
     if not data:
         return
+    width, height = screen.get_size()
+
+    # One column per bar, or per pixel once there are more points than pixels
+    if columns is None:
+        columns = ColumnStats(data, width)
 
     # Calculate elevation range if not provided
-    elevations = [e[2] for e in data]
     if min_elev is None or max_elev is None:
-        max_elev = max(elevations)
-        min_elev = min(elevations)
+        max_elev = float(columns.max.max())
+        min_elev = float(columns.min.min())
+
+    # Map every column's envelope to heights and LUT colors in one pass
+    (min_heights, mean_heights, max_heights), colors = column_shades(columns, slice(None), min_elev, max_elev, get_color_lut(color_theme),
+                                                                     height)
+    full, mid, dim = envelope_tones(colors)
+
+    # Highlight compared and hovered bars
+    marked = [i for i in list(highlight) + [hover_index] if i is not None and 0 <= i < len(data)]
+    for column in columns.column_of(marked) if marked else []:
+        full[column] = mid[column] = dim[column] = (255, 255, 255)
+    full, mid, dim = (map_colors(screen, tone) for tone in (full, mid, dim))
+    profiler.lap("color")
+
+    # Expand columns to pixel columns; anything past the window edge is skipped
+    column_of_x = np.arange(width) // columns.column_width
+    visible = column_of_x < columns.count
+    shown = column_of_x[visible]
+
+    def per_pixel(values):
+        expanded = np.zeros(width, dtype=values.dtype)
+        expanded[visible] = values[shown]
+        return expanded[:, None]
+
+    # Write every column into the screen buffer at once instead of one rect per bar
+    y = np.arange(height)[None, :]
+    envelope = np.where(y >= height - per_pixel(min_heights), per_pixel(full),
+               np.where(y >= height - per_pixel(mean_heights), per_pixel(mid),
+               np.where(y >= height - per_pixel(max_heights), per_pixel(dim), 0)))
+    pixels = pygame.surfarray.pixels2d(screen)
+    pixels[:width, :height] = envelope
+    del pixels
 
-    # Set bar width
-    elev_range = max_elev - min_elev if max_elev != min_elev else 1
-    bar_width = max(1, WIDTH // len(data))
-
-
-    for i, (lat, lon, elev, _) in enumerate(data):
-        # Normalize elevation to bar height
-        height = int((elev - min_elev) / elev_range * HEIGHT)
-        x = i * bar_width
-        y = HEIGHT - height
-
-        norm = (elev - min_elev) / elev_range
-
-        #Apply selected color theme
-        if color_theme == "terrain":
-            red = int(255 * norm)
-            green = int(255 * (1 - abs(norm - 0.5) * 2))
-            blue = int(255 * (1 - norm))
-            color = (red, green, blue)
-        elif color_theme == "grayscale":
-            shade = int(255 * norm)
-            color = (shade, shade, shade)
-        elif color_theme == "heat":
-            color = plt.cm.inferno(norm)
-            color = tuple(int(c * 255) for c in color[:3])
-        else:
-            color = (255, 255, 255)
+    # Draw elevation legend matching the theme
+    if legend:
+        draw_color_legend(screen, font, color_theme)
+    profiler.lap("draw")
 
-        # Highlight hovered bar
-        if i in highlight or i == hover_index:
-            color = (255, 255, 255)
 
-        # Draw vertical bar
-        pygame.draw.rect(screen, color, (x, y, bar_width, height))
+_legend_gradients = {}
 
-    # Draw elevation legend matching the theme
-    draw_color_legend(screen, font, color_theme)
+
+def get_legend_gradient(color_theme, width=LEGEND_RECT.width):
+    # One-pixel-high gradient across the theme's LUT, built once per theme
+    if (color_theme, width) not in _legend_gradients:
+        lut = get_color_lut(color_theme)
+        norm = np.arange(width) / width
+        rgb = lut[(norm * (len(lut) - 1)).astype(np.int32)]
+        _legend_gradients[color_theme, width] = pygame.surfarray.make_surface(np.ascontiguousarray(rgb[:, None, :]))
+    return _legend_gradients[color_theme, width]
 
 
 def draw_color_legend(screen, font, color_theme):
     # Define rectangle area
-    legend_rect = pygame.Rect(10, HEIGHT - 30, 200, 10)
-
-    # Draw gradient bar from left to right
-    for x in range(legend_rect.width):
-        norm = x / legend_rect.width
-
-        # Match color theme
-        if color_theme == "terrain":
-            red = int(255 * norm)
-            green = int(255 * (1 - abs(norm - 0.5) * 2))
-            blue = int(255 * (1 - norm))
-            color = (red, green, blue)
-        elif color_theme == "grayscale":
-            shade = int(255 * norm)
-            color = (shade, shade, shade)
-        elif color_theme == "heat":
-            import matplotlib.pyplot as plt
-            cmap_color = plt.cm.inferno(norm)
-            color = tuple(int(c * 255) for c in cmap_color[:3])
-        else:
-            color = (255, 255, 255)
+    legend_rect = LEGEND_RECT
 
-        screen.set_at((legend_rect.x + x, legend_rect.y), color)
+    # Draw gradient bar from left to right using the theme's LUT
+    screen.blit(get_legend_gradient(color_theme, legend_rect.width), legend_rect.topleft)
 
     # Add labels
     label_low = font.render("Low", True, (255, 255, 255))
@@ -93,427 +192,747 @@ def draw_color_legend(screen, font, color_theme):
     screen.blit(label_high, (legend_rect.x + legend_rect.width - 30, legend_rect.y - 15))
 
 
-def get_summary_text(data):
-    if not data:
-        return []
-
-    # Sort data by elevation
-    sorted_data = sorted(data, key=lambda x: x[2])
-    n = len(sorted_data)
-
-    #get points
-    low = sorted_data[0]
-    high = sorted_data[-1]
-    median = sorted_data[n // 2]
-
-
-    return [
-        f"Lowest:  ({low[0]:.2f}, {low[1]:.2f}) → {low[2]:.2f} m",
-        f"Median:  ({median[0]:.2f}, {median[1]:.2f}) → {median[2]:.2f} m",
-        f"Highest: ({high[0]:.2f}, {high[1]:.2f}) → {high[2]:.2f} m"
-    ]
-
-def show_elevation_heatmap(data, rows, cols):
-    if not data or len(data) != rows * cols:
-        print("Data size mismatch or missing.")
-        return
-
-    # Convert flat elevation list into 2D grid
-    elevations = [e[2] for e in data]
-    grid = np.array(elevations).reshape((rows, cols))
-
-    # Plot using matplotlib
-    plt.figure(figsize=(8, 6))
-    plt.imshow(grid, cmap='terrain', aspect='auto', origin='lower')
-    plt.colorbar(label='Elevation (m)')
-    plt.title("Elevation Grid Visualization")
-    plt.xlabel("Columns (Longitude)")
-    plt.ylabel("Rows (Latitude)")
-    plt.tight_layout()
-    plt.show()
-
-def show_comparison_heatmap(original_data, sorted_data, rows, cols):
-    if not original_data or not sorted_data:
-        return
-
-    # Extract elevation values and reshape into 2D grids
-    original_grid = np.array([e[2] for e in original_data]).reshape((rows, cols))
-    sorted_grid = np.array([e[2] for e in sorted_data]).reshape((rows, cols))
-
-    #side-by-side plots
-    fig, axes = plt.subplots(1, 2, figsize=(12, 5))
+def get_summary_text(data, percentiles=SUMMARY_PERCENTILES):
+    return summary_lines(data, percentiles)
 
-    #original
-    im1 = axes[0].imshow(original_grid, cmap='terrain', aspect='auto', origin='lower')
-    axes[0].set_title("Original Elevation Grid")
-    fig.colorbar(im1, ax=axes[0], fraction=0.046, pad=0.04)
 
-    #sorted
-    im2 = axes[1].imshow(sorted_grid, cmap='terrain', aspect='auto', origin='lower')
-    axes[1].set_title("Sorted Elevation Grid")
-    fig.colorbar(im2, ax=axes[1], fraction=0.046, pad=0.04)
+def build_summary_histogram(stats, color_theme, size):
+    # Elevation histogram of the grid, each bin in its theme color
+    surface = pygame.Surface(size)
+    rect = surface.get_rect()
+    counts = stats.histogram
+    lut = get_color_lut(color_theme)
+    surface.fill((30, 30, 30))
+    bar_width = rect.width / len(counts)
+    tallest = max(1, counts.max())
+    for i, count in enumerate(counts):
+        height = int(count / tallest * (rect.height - 2))
+        if height:
+            color = lut[i * (len(lut) - 1) // max(1, len(counts) - 1)].tolist()
+            left = int(i * bar_width)
+            pygame.draw.rect(surface, color, (left, rect.bottom - height, max(1, int((i + 1) * bar_width) - int(i * bar_width)), height))
+    return surface
 
-    for ax in axes:
-        ax.set_xlabel("Columns")
-        ax.set_ylabel("Rows")
 
-    plt.tight_layout()
-    plt.show()
+# The statistics are cached per grid, so this only rebuilds on a new grid or theme
+_summary_histogram = SurfaceCache(build_summary_histogram)
 
 
-
-def reset_visualization_state(_, rows, cols):
-    new_data = get_elevation_grid(rows, cols)
-    show_elevation_heatmap(new_data, rows, cols)
+def draw_summary_histogram(screen, data, color_theme, rect=SUMMARY_HISTOGRAM_RECT):
+    if not data:
+        return None
+    return screen.blit(_summary_histogram.get(order_statistics(data), color_theme, rect.size), rect)
+
+
+def build_button_strip(font, buttons, active, lineup=()):
+    # Every algorithm button on one surface, with the active one in red and
+    # picked racers outlined. The gaps are color-keyed out so the bars show
+    # through between buttons.
+    area = buttons[0][0].unionall([rect for rect, _ in buttons[1:]])
+    strip = pygame.Surface(area.size)
+    strip.fill((0, 0, 0))
+    strip.set_colorkey((0, 0, 0))
+    for rect, name in buttons:
+        rect = rect.move(-area.x, -area.y)
+        pygame.draw.rect(strip, (200, 50, 50) if name == active else (50, 50, 200), rect)
+        if name in lineup:
+            pygame.draw.rect(strip, (255, 200, 0), rect, 2)
+        label = font.render(name, True, (255, 255, 255))
+        strip.blit(label, label.get_rect(center=rect.center))
+    return strip
+
+
+def race_viewports(count, area=RACE_AREA, gap=6):
+    # Tile `count` lanes over the area in a near-square grid, row by row
+    columns = math.ceil(math.sqrt(count))
+    rows = math.ceil(count / columns)
+    width = (area.width - gap * (columns + 1)) // columns
+    height = (area.height - gap * (rows - 1)) // rows
+    return [pygame.Rect(area.x + gap + (i % columns) * (width + gap), area.y + (i // columns) * (height + gap), width, height)
+            for i in range(count)]
+
+
+def format_rate(steps_per_second):
+    for scale, suffix in ((1e6, "M"), (1e3, "k")):
+        if steps_per_second >= scale:
+            return f"{steps_per_second / scale:.1f}{suffix}"
+    return f"{steps_per_second:.0f}"
+
+
+class RaceView:
+    # Draws a Race as tiled viewports. Each lane keeps its own bar layer and
+    # column buckets, so a frame repaints only the columns its events touched.
+    def __init__(self, race, area=RACE_AREA):
+        self.race = race
+        self.viewports = race_viewports(len(race.lanes), area)
+        self.layers = []
+        self.columns = []
+        for lane, viewport in zip(race.lanes, self.viewports):
+            size = (viewport.width, viewport.height - RACE_LANE_HEADER)
+            self.layers.append(pygame.Surface(size).convert())
+            self.columns.append(ColumnStats(lane.data, size[0]))
+        self.drawn_highlight = [()] * len(race.lanes)
+        self.full_redraw = True
+
+    def draw(self, screen, font, events, color_theme):
+        # events maps lanes to the step events they applied this frame. The
+        # whole screen is cleared, since the single-sort view and last frame's
+        # status text would otherwise show through around the lanes.
+        screen.fill((0, 0, 0))
+        for i, (lane, viewport, layer) in enumerate(zip(self.race.lanes, self.viewports, self.layers)):
+            highlight = tuple(lane.run.highlight) if not lane.done else ()
+            dirty = changed_indices(events.get(lane, ()))
+            dirty.update(self.drawn_highlight[i] + highlight)
+            paint_bars(layer, lane.data, font, self.columns[i], dirty, highlight, color_theme, self.full_redraw, legend=False)
+            self.drawn_highlight[i] = highlight
+            screen.blit(layer, (viewport.x, viewport.y + RACE_LANE_HEADER))
+            self.draw_header(screen, font, lane, viewport)
+        self.full_redraw = False
+
+    def draw_header(self, screen, font, lane, viewport):
+        if lane.place is not None:
+            title = f"#{lane.place} {lane.name} | finished in {lane.finish_time:.2f}s compute"
+            color = (80, 220, 80) if lane.place == 1 else (255, 255, 255)
+        else:
+            title = f"{lane.name} | {lane.steps} steps"
+            color = (255, 255, 0)
+        counters = (f"Comparisons: {lane.metrics['comparisons']}  Swaps: {lane.metrics['swaps']}  "
+                    f"{format_rate(lane.throughput())} steps/s")
+        screen.blit(font.render(title, True, color), (viewport.x, viewport.y + 2))
+        screen.blit(font.render(counters, True, (200, 200, 200)), (viewport.x, viewport.y + 17))
+        pygame.draw.rect(screen, (90, 90, 90), viewport, 1)
+
+
+def draw_race_status(screen, font, race):
+    state = "Paused" if race.paused else ("Finished" if race.done else "Racing")
+    text = f"{state} | speed {race.speed:g}x | {race.elapsed():.1f}s | {race.allowance()} steps per lane per frame"
+    label = font.render(text, True, (255, 255, 0))
+    screen.blit(label, (WIDTH - label.get_width() - 10, HEIGHT - 42))
+
+
+def format_race_results(race):
+    lanes = sorted(race.lanes, key=lambda lane: (lane.place is None, lane.place or 0))
+    lines = [f"Race over {len(race.lanes[0].data)} cells:"]
+    for lane in lanes:
+        place = f"{lane.place}." if lane.place is not None else "-"
+        lines.append(f"  {place:<3} {lane.name:<10} {lane.run.compute_time:7.3f}s compute  {lane.metrics['comparisons']:>10} comparisons  "
+                     f"{lane.metrics['swaps']:>10} swaps  {format_rate(lane.throughput())} steps/s")
+    return "\n".join(lines)
+
+
+def reset_visualization_state(prefetcher, rows, cols):
+    # Take a grid the prefetcher already loaded in the background; None keeps
+    # the current grid while the next one is still on its way
+    new_data = prefetcher.get()
+    if not new_data:
+        return None, []
     new_summary = get_summary_text(new_data)
-    indexed = [(lat, lon, elev, idx) for idx, (lat, lon, elev) in enumerate(new_data)]
-    return indexed, new_summary
-
-
-def stable_key(item):
-    return (item[2], item[3]) if len(item) > 3 else (item[2], 0)
-
-def bubble_sort_visualized(data, screen, clock, metrics, color_theme):
-    font = pygame.font.SysFont("Arial", 14)
-    min_elev = min(e[2] for e in data)
-    max_elev = max(e[2] for e in data)
-
-    for i in range(len(data)):
-        for j in range(0, len(data) - i - 1):
-            metrics["comparisons"] += 1
-            if stable_key(data[j]) > stable_key(data[j + 1]):
-                if data[j] != data[j + 1]:
-                    data[j], data[j + 1] = data[j + 1], data[j]
-                    metrics["swaps"] += 1
-            draw_bars(screen, data, font, highlight=[j, j + 1], min_elev=min_elev, max_elev=max_elev, color_theme=color_theme)
-            pygame.display.flip()
-            pygame.time.wait(5)
-
-
-
-def quick_sort_visualized(data, screen, clock, metrics, color_theme):
-    font = pygame.font.SysFont("Arial", 14)
-    min_elev = min(e[2] for e in data)
-    max_elev = max(e[2] for e in data)
-
-    def quick_sort(arr, low, high):
-        if low < high:
-            pi = partition(arr, low, high)
-            quick_sort(arr, low, pi - 1)
-            quick_sort(arr, pi + 1, high)
-
-    def partition(arr, low, high):
-        pivot = arr[high]
-        i = low - 1
-        for j in range(low, high):
-            metrics["comparisons"] += 1
-            draw_bars(screen, arr, font, highlight=[j, high], min_elev=min_elev, max_elev=max_elev, color_theme=color_theme)
-            pygame.display.flip()
-            time.sleep(0.01)
-            if stable_key(arr[j]) < stable_key(pivot):
-                i += 1
-                if arr[i] != arr[j]:
-                    arr[i], arr[j] = arr[j], arr[i]
-                    metrics["swaps"] += 1
-        if arr[i + 1] != arr[high]:
-            arr[i + 1], arr[high] = arr[high], arr[i + 1]
-            metrics["swaps"] += 1
-        return i + 1
-
-    quick_sort(data, 0, len(data) - 1)
-
-    draw_bars(screen, data, font, min_elev=min_elev, max_elev=max_elev, color_theme=color_theme)
-    pygame.display.flip()
-
-def merge_sort_visualized(data, screen, clock, metrics, color_theme):
-    font = pygame.font.SysFont("Arial", 14)
-    min_elev = min(e[2] for e in data)
-    max_elev = max(e[2] for e in data)
-
-    def merge_sort(arr, l, r):
-        if l < r:
-            m = (l + r) // 2
-            merge_sort(arr, l, m)
-            merge_sort(arr, m + 1, r)
-            merge(arr, l, m, r)
-
-    def merge(arr, l, m, r):
-        left = arr[l:m+1]
-        right = arr[m+1:r+1]
-        i = j = 0
-        k = l
-        while i < len(left) and j < len(right):
-            metrics["comparisons"] += 1
-            new_val = left[i] if stable_key(left[i]) <= stable_key(right[j]) else right[j]
-            if arr[k] != new_val:
-                arr[k] = new_val
-                metrics["swaps"] += 1
-            else:
-                arr[k] = new_val
-            draw_bars(screen, data, font, highlight=[k], min_elev=min_elev, max_elev=max_elev, color_theme=color_theme)
-            pygame.display.flip()
-            time.sleep(0.01)
-            k += 1
-            if stable_key(left[i]) <= stable_key(right[j]):
-                i += 1
-            else:
-                j += 1
-        while i < len(left):
-            if arr[k] != left[i]:
-                arr[k] = left[i]
-                metrics["swaps"] += 1
-            else:
-                arr[k] = left[i]
-            draw_bars(screen, data, font, highlight=[k], min_elev=min_elev, max_elev=max_elev, color_theme=color_theme)
-            pygame.display.flip()
-            time.sleep(0.01)
-            i += 1
-            k += 1
-        while j < len(right):
-            if arr[k] != right[j]:
-                arr[k] = right[j]
-                metrics["swaps"] += 1
-            else:
-                arr[k] = right[j]
-            draw_bars(screen, data, font, highlight=[k], min_elev=min_elev, max_elev=max_elev, color_theme=color_theme)
-            pygame.display.flip()
-            time.sleep(0.01)
-            j += 1
-            k += 1
-
-    merge_sort(data, 0, len(data) - 1)
-
-    draw_bars(screen, data, font, min_elev=min_elev, max_elev=max_elev, color_theme=color_theme)
-    pygame.display.flip()
-
-
-
-def insertion_sort_visualized(data, screen, clock, metrics, color_theme):
-    font = pygame.font.SysFont("Arial", 14)
-    min_elev = min(e[2] for e in data)
-    max_elev = max(e[2] for e in data)
-
-    for i in range(1, len(data)):
-        key = data[i]
-        j = i - 1
-        while j >= 0:
-            metrics["comparisons"] += 1
-            if stable_key(data[j]) > stable_key(key):
-                if data[j + 1] != data[j]:
-                    data[j + 1] = data[j]
-                    metrics["swaps"] += 1
-                else:
-                    data[j + 1] = data[j]
-                j -= 1
-                draw_bars(screen, data, font, highlight=[j + 1], min_elev=min_elev, max_elev=max_elev, color_theme=color_theme)
-                pygame.display.flip()
-                pygame.time.wait(10)
-            else:
-                break
-        if data[j + 1] != key:
-            data[j + 1] = key
-            metrics["swaps"] += 1
-
-
-
-    draw_bars(screen, data, font, min_elev=min_elev, max_elev=max_elev, color_theme=color_theme)
-    pygame.display.flip()
-
-
-def selection_sort_visualized(data, screen, clock, metrics, color_theme):
-    font = pygame.font.SysFont("Arial", 14)
-    min_elev = min(e[2] for e in data)
-    max_elev = max(e[2] for e in data)
-    n = len(data)
-
-    for i in range(n):
-        min_idx = i
-        for j in range(i + 1, n):
-            metrics["comparisons"] += 1
-            if stable_key(data[j]) < stable_key(data[min_idx]):
-                min_idx = j
-            draw_bars(screen, data, font, highlight=[j, min_idx], min_elev=min_elev, max_elev=max_elev, color_theme=color_theme)
-            pygame.display.flip()
-            pygame.time.wait(10)
-        if i != min_idx and data[i] != data[min_idx]:
-            data[i], data[min_idx] = data[min_idx], data[i]
-            metrics["swaps"] += 1
-
-
-    draw_bars(screen, data, font, min_elev=min_elev, max_elev=max_elev, color_theme=color_theme)
-    pygame.display.flip()
-
-
-def heap_sort_visualized(data, screen, clock, metrics, color_theme):
-    font = pygame.font.SysFont("Arial", 14)
-    min_elev = min(e[2] for e in data)
-    max_elev = max(e[2] for e in data)
-
-    def heapify(arr, n, i):
-        largest = i
-        l = 2 * i + 1
-        r = 2 * i + 2
-        if l < n:
-            metrics["comparisons"] += 1
-            if stable_key(arr[l]) > stable_key(arr[largest]):
-                largest = l
-        if r < n:
-            metrics["comparisons"] += 1
-            if stable_key(arr[r]) > stable_key(arr[largest]):
-                largest = r
-        if largest != i:
-            if arr[i] != arr[largest]:
-                arr[i], arr[largest] = arr[largest], arr[i]
-                metrics["swaps"] += 1
-            draw_bars(screen, data, font, highlight=[i, largest], min_elev=min_elev, max_elev=max_elev, color_theme=color_theme)
-            pygame.display.flip()
-            pygame.time.wait(10)
-            heapify(arr, n, largest)
-
-    n = len(data)
-    for i in range(n // 2 - 1, -1, -1):
-        heapify(data, n, i)
-    for i in range(n - 1, 0, -1):
-        if data[i] != data[0]:
-            data[i], data[0] = data[0], data[i]
-            metrics["swaps"] += 1
-        draw_bars(screen, data, font, highlight=[0, i], min_elev=min_elev, max_elev=max_elev, color_theme=color_theme)
-        pygame.display.flip()
-        pygame.time.wait(10)
-        heapify(data, i, 0)
-
-
-
-    draw_bars(screen, data, font, min_elev=min_elev, max_elev=max_elev, color_theme=color_theme)
-    pygame.display.flip()
-
+    return new_data, new_summary
+
+
+def changed_indices(events):
+    # Bar positions whose contents were modified by a batch of step events
+    changed = set()
+    for op, a, b in events:
+        if op == SWAP:
+            changed.add(a)
+            changed.add(b)
+        elif op == WRITE:
+            changed.add(a)
+    return changed
+
+
+def draw_bar_columns(screen, columns, which, highlight=(), min_elev=None, max_elev=None, color_theme="terrain"):
+    # Repaint only the given columns; returns the repainted areas, with
+    # neighbouring columns merged into one rect
+    screen_width, screen_height = screen.get_size()
+    which = sorted(c for c in which if 0 <= c < columns.count and c * columns.column_width < screen_width)
+    if not which:
+        return []
+    (min_heights, mean_heights, max_heights), colors = column_shades(columns, which, min_elev, max_elev, get_color_lut(color_theme),
+                                                                     screen_height)
+    tones = envelope_tones(colors)
+    profiler.lap("color")
+
+    width = columns.column_width
+    spans = []
+    for k, column in enumerate(which):
+        x = column * width
+        if spans and spans[-1].right == x:
+            spans[-1].width += width
+        else:
+            spans.append(pygame.Rect(x, 0, width, screen_height))
+        screen.fill((0, 0, 0), (x, 0, width, screen_height))
+        bottom = screen_height
+        for tone, height in zip(tones, (min_heights[k], mean_heights[k], max_heights[k])):
+            color = (255, 255, 255) if column in highlight else tone[k].tolist()
+            top = screen_height - int(height)
+            if top < bottom:
+                screen.fill(color, (x, top, width, bottom - top))
+                bottom = top
+    profiler.lap("draw")
+    return spans
+
+
+def draw_dirty_bars(screen, data, font, dirty, highlight=(), min_elev=None, max_elev=None, color_theme="terrain", columns=None,
+                    legend=True):
+    # Refresh the buckets holding changed positions, then repaint their columns
+    touched = columns.update(dirty)
+    profiler.lap("stats")
+    marked = set(columns.column_of([i for i in highlight if i is not None and 0 <= i < len(data)]).tolist())
+
+    # The legend sits on top of the bars, so if any column under it changed,
+    # repaint every column it covers and draw it again
+    legend_columns = range(LEGEND_AREA.left // columns.column_width, LEGEND_AREA.right // columns.column_width + 1)
+    touches_legend = legend and any(c in touched for c in legend_columns)
+    if touches_legend:
+        touched = touched.union(legend_columns)
+
+    spans = draw_bar_columns(screen, columns, touched, marked, min_elev, max_elev, color_theme)
+    if touches_legend:
+        draw_color_legend(screen, font, color_theme)
+    return spans
+
+
+def paint_bars(layer, data, font, columns, dirty, highlight, color_theme, full_redraw, legend=True):
+    # Bring the bar layer up to date: repaint the dirty columns, or everything
+    # once most of the layer changed anyway. Returns the rects that changed.
+    min_elev, max_elev = float(data.elev.min()), float(data.elev.max())
+    if not full_redraw and len(columns.columns_of(dirty)) * columns.column_width > layer.get_width() // 2:
+        columns.refresh()
+        full_redraw = True
+    profiler.lap("stats")
+    if full_redraw:
+        draw_bars(layer, data, font, highlight=highlight, min_elev=min_elev, max_elev=max_elev, color_theme=color_theme, columns=columns,
+                  legend=legend)
+        return [layer.get_rect()]
+    if dirty:
+        return draw_dirty_bars(layer, data, font, dirty, highlight, min_elev, max_elev, color_theme, columns, legend)
+    return []
+
+
+def draw_prefetch_stats(screen, font, stats):
+    last = f"{stats['last_latency']:.2f}s" if stats["last_latency"] is not None else "-"
+    average = f"{stats['avg_latency']:.2f}s" if stats["avg_latency"] is not None else "-"
+    ready = f"{stats['ready']}/{stats['depth']}" if stats["ready"] else "fetching…"
+    text = f"Next grids ready: {ready} | fetch {last} (avg {average})"
+    if stats["failures"]:
+        text += f" | {stats['failures']} failed"
+    label = font.render(text, True, (180, 180, 180))
+    return screen.blit(label, (WIDTH - label.get_width() - 10, HEIGHT - 60))
+
+
+def draw_sort_status(screen, font, run):
+    state = "Paused" if run.paused else "Sorting"
+    text = f"{state} | speed {run.scheduler.speed:g}x | {run.scheduler.applied} steps"
+    if run.recorder is not None:
+        text += " | REC"
+    label = font.render(text, True, (255, 255, 0))
+    return screen.blit(label, (WIDTH - label.get_width() - 10, 50))
+
+
+def build_profile_background(size):
+    background = pygame.Surface(size, pygame.SRCALPHA)
+    background.fill((0, 0, 0, 180))
+    return background
+
+
+_profile_background = SurfaceCache(build_profile_background)
+
+
+def draw_profile_overlay(screen, font, profiler):
+    # Rolling per-section frame times and a graph of recent frame times
+    box = PROFILE_OVERLAY
+    screen.blit(_profile_background.get(box.size), box.topleft)
+
+    frame = profiler.average("frame")
+    fps = 1.0 / frame if frame else 0.0
+    lines = [f"Frame {frame * 1000:.1f} ms ({fps:.0f} fps)"]
+    lines += [f"{name:<8} {profiler.average(name) * 1000:6.2f} ms" for name in SECTIONS]
+    for i, line in enumerate(lines):
+        screen.blit(font.render(line, True, (255, 255, 255)), (box.x + 6, box.y + 4 + i * 16))
+
+    # One pixel column per recent frame, red once it overran the frame budget
+    budget = 1.0 / FPS
+    bottom = box.bottom - 4
+    for i, frame in enumerate(profiler.frames):
+        height = min(PROFILE_GRAPH_HEIGHT, int(frame["frame"] / (2 * budget) * PROFILE_GRAPH_HEIGHT))
+        color = (80, 220, 80) if frame["frame"] <= budget * 1.1 else (230, 70, 70)
+        x = box.right - FRAME_HISTORY + i
+        pygame.draw.line(screen, color, (x, bottom), (x, bottom - height))
+    midline = pygame.draw.line(screen, (200, 200, 200), (box.right - FRAME_HISTORY, bottom - PROFILE_GRAPH_HEIGHT // 2),
+                               (box.right, bottom - PROFILE_GRAPH_HEIGHT // 2))
+    return box.union(midline)
+
+
+def export_profile(path):
+    count = profiler.export_trace(path)
+    print(f"Wrote {count} trace events to {path}")
+    print(format_histogram(profiler, "frame"))
+
+
+def run_visualizer(data, default_sort_func, rows, cols, profile=False, trace_path=None, record_dir=None,
+                   color_theme="terrain", source=None, race=None):
+    # Start loading the next grids while the user looks at this one
+    prefetcher = GridPrefetcher(functools.partial(get_elevation_grid, rows, cols, source=source), depth=PREFETCH_DEPTH)
+
+    # Instrumentation stays off unless asked for; P toggles it at runtime
+    export_on_exit = trace_path is not None
+    profiler.enabled = profile or export_on_exit
+    trace_path = trace_path or PROFILE_TRACE_PATH
+    # Sorts are recorded for replay while this is on; W toggles it
+    recording = record_dir is not None
+    record_dir = record_dir or TRACE_DIR
 
-def run_visualizer(data, default_sort_func, rows, cols):
-    import random
     pygame.init()
     screen = pygame.display.set_mode((WIDTH, HEIGHT))
     pygame.display.set_caption("Elevation Sort Visualizer")
     clock = pygame.time.Clock()
-    font = pygame.font.SysFont("Arial", 14)
+    # Labels repeat from frame to frame, so rendered text is cached per string
+    font = CachedFont(pygame.font.SysFont("Arial", 14))
+
+    # Bars are drawn into their own layer so a sort step only repaints the
+    # columns it changed. Only those columns and the areas the UI covered last
+    # frame are copied back to the screen, and pushed with display.update.
+    bar_layer = pygame.Surface((WIDTH, HEIGHT)).convert()
 
     # Available sorting algorithms and color themes
-    sort_funcs = {
-        "Quick": quick_sort_visualized,
-        "Merge": merge_sort_visualized,
-        "Insertion": insertion_sort_visualized,
-        "Selection": selection_sort_visualized,
-        "Heap": heap_sort_visualized,
-        "Bubble": bubble_sort_visualized
-    }
-
-    color_themes = ["terrain", "grayscale", "heat"]
-    current_theme_index = 0
-
-    # Create buttons
-    button_width = 100
+    sort_funcs = SORT_ALGORITHMS
+
+    color_themes = COLOR_THEMES
+    current_theme_index = color_themes.index(color_theme)
+
+    # Create buttons, sized so every algorithm fits across the window
+    button_width = min(100, (WIDTH - 10) // len(sort_funcs) - 10)
     button_height = 25
     buttons = []
     for i, name in enumerate(sort_funcs):
         rect = pygame.Rect(10 + i * (button_width + 10), 10, button_width, button_height)
         buttons.append((rect, name))
+    # Buttons only change color when the active sort does, so they are drawn
+    # onto one surface that is rebuilt just then
+    button_area = buttons[0][0].unionall([rect for rect, _ in buttons[1:]])
+    button_strip = SurfaceCache(functools.partial(build_button_strip, font, buttons))
 
     current_sort = None
+    sort_run = None
     sorted_once = False
     running = True
+    # A sort passed in starts straight away, as if its button was clicked
+    requested = next((name for name, func in sort_funcs.items() if func is default_sort_func), None)
+    # Sorts picked for the next race, and the race being shown; `race` starts one straight away
+    race_lineup = list(race or [])
+    race_requested = bool(race_lineup)
+    active_race = None
+    race_view = None
+    race_events = {}
 
     # Initial data and summary setup
-    data, summary_lines = reset_visualization_state(data, rows, cols)
-    original_data = data.copy()
-    working_data = original_data.copy()
+    summary_lines = get_summary_text(data)
+    original_data = data
+    working_data = original_data.snapshot()
+    original_copy = working_data.snapshot()
     sort_duration = 0
-    metrics = {"comparisons": 0, "swaps": 0}
+    metrics = new_metrics()
+    full_redraw = True
+    drawn_highlight = ()
+    # Screen areas the UI was drawn over last frame
+    ui_rects = []
+    heatmaps = HeatmapPanel(HEATMAP_PANEL)
+    heatmaps.set("Before", working_data)
+    comparison = None
 
     while running:
+        profiler.begin_frame()
+        dirty = set()
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 running = False
 
             elif event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_r: #Reset
-                    data, summary_lines = reset_visualization_state(data, rows, cols)
-                    original_data = data.copy()
-                    working_data = original_data.copy()
+                    new_data, new_summary = reset_visualization_state(prefetcher, rows, cols)
+                    if not new_data:
+                        continue
+                    profiler.end_sort("cancelled")
+                    data, summary_lines = new_data, new_summary
+                    original_data = data
+                    working_data = original_data.snapshot()
+                    heatmaps.clear()
+                    comparison = None
+                    heatmaps.set("Before", working_data)
                     sorted_once = False
                     current_sort = None
+                    sort_run = None
+                    active_race = race_view = None
                     sort_duration = 0
-                    metrics = {"comparisons": 0, "swaps": 0}
+                    metrics = new_metrics()
+                    full_redraw = True
                 elif event.key == pygame.K_s: # Shuffle
-                    random.shuffle(working_data)
+                    profiler.end_sort("cancelled")
+                    if sort_run:
+                        working_data.order[:] = original_copy.order
+                    working_data.shuffle()
+                    heatmaps.clear()
+                    comparison = None
+                    heatmaps.set("Before", working_data)
                     sorted_once = False
                     current_sort = None
+                    sort_run = None
+                    active_race = race_view = None
                     sort_duration = 0
-                    metrics = {"comparisons": 0, "swaps": 0}
+                    metrics = new_metrics()
                     summary_lines = get_summary_text(working_data)
+                    full_redraw = True
                 elif event.key == pygame.K_c:  # Switch color theme
                     current_theme_index = (current_theme_index + 1) % len(color_themes)
+                    full_redraw = True
+                    if race_view:
+                        race_view.full_redraw = True
+                elif event.key == pygame.K_a:  # Race the picked sorts
+                    race_requested = True
+                elif active_race and event.key == pygame.K_SPACE:
+                    active_race.toggle_pause()
+                elif active_race and event.key == pygame.K_n and active_race.paused:
+                    race_events = active_race.single_step()
+                elif active_race and event.key in (pygame.K_x, pygame.K_BACKSPACE):  # Leave the race
+                    active_race = race_view = None
+                    full_redraw = True
+                elif active_race and event.key in (pygame.K_UP, pygame.K_EQUALS, pygame.K_PLUS, pygame.K_KP_PLUS):
+                    active_race.change_speed(2)
+                elif active_race and event.key in (pygame.K_DOWN, pygame.K_MINUS, pygame.K_KP_MINUS):
+                    active_race.change_speed(0.5)
+                elif event.key == pygame.K_SPACE and sort_run:  # Pause / resume
+                    sort_run.toggle_pause()
+                elif event.key == pygame.K_n and sort_run and sort_run.paused:  # Single step
+                    events = sort_run.single_step()
+                    dirty.update(changed_indices(events))
+                elif event.key in (pygame.K_x, pygame.K_BACKSPACE) and sort_run:  # Cancel
+                    profiler.end_sort("cancelled")
+                    working_data.order[:] = original_copy.order
+                    current_sort = None
+                    sort_run = None
+                    metrics = new_metrics()
+                    full_redraw = True
+                elif event.key in (pygame.K_UP, pygame.K_EQUALS, pygame.K_PLUS, pygame.K_KP_PLUS) and sort_run:
+                    sort_run.scheduler.change_speed(2)
+                elif event.key in (pygame.K_DOWN, pygame.K_MINUS, pygame.K_KP_MINUS) and sort_run:
+                    sort_run.scheduler.change_speed(0.5)
+                elif event.key == pygame.K_p:  # Toggle profiling and its overlay
+                    profiler.toggle()
+                    full_redraw = True
+                elif event.key == pygame.K_h:  # Show / hide the heatmap panel
+                    heatmaps.visible = not heatmaps.visible
+                elif event.key == pygame.K_e and comparison:  # Export the last before/after heatmaps
+                    os.makedirs(HEATMAP_DIR, exist_ok=True)
+                    path = os.path.join(HEATMAP_DIR, f"comparison-{time.strftime('%Y%m%d-%H%M%S')}.png")
+                    export_comparison_heatmap(*comparison, rows, cols, path)
+                elif event.key == pygame.K_w:  # Toggle recording of the next sorts
+                    recording = not recording
+                    print(f"Sort recording {'on' if recording else 'off'}")
+                elif event.key == pygame.K_t:  # Export the trace so far
+                    export_profile(trace_path)
                 elif event.key == pygame.K_ESCAPE:  # Quit
                     running = False
 
             elif event.type == pygame.MOUSEBUTTONDOWN:
                 mx, my = pygame.mouse.get_pos()
                 for rect, name in buttons:
-                    if rect.collidepoint(mx, my):
-                        current_sort = sort_funcs[name]
-                        working_data = working_data.copy()
-                        sorted_once = False
-                        sort_duration = 0
-                        metrics = {"comparisons": 0, "swaps": 0}
-
-        if current_sort and not sorted_once:
-            original_copy = working_data.copy()
-            start_time = time.time()
-            # Run selected sort
-            current_sort(working_data, screen, clock, metrics, color_themes[current_theme_index])
-            sort_duration = time.time() - start_time
-            sorted_once = True
-            summary_lines = get_summary_text(working_data)
-            show_comparison_heatmap(original_copy, working_data, rows, cols)
-
-        # Hover
-        mouse_x, _ = pygame.mouse.get_pos()
-        bar_width = max(1, WIDTH // len(working_data))
-        hover_index = mouse_x // bar_width if bar_width else None
-
-        draw_bars(screen, working_data, font, hover_index=hover_index, color_theme=color_themes[current_theme_index])
+                    if not rect.collidepoint(mx, my):
+                        continue
+                    if event.button == 3:  # Right-click picks or drops a racer
+                        if name in race_lineup:
+                            race_lineup.remove(name)
+                        else:
+                            race_lineup.append(name)
+                    else:
+                        requested = name
+
+        if requested:
+            # Switching algorithms mid-sort starts over from the pre-sort order
+            if sort_run:
+                working_data.order[:] = original_copy.order
+            active_race = race_view = None
+            current_sort = sort_funcs[requested]
+            original_copy = working_data.snapshot()
+            heatmaps.clear()
+            comparison = None
+            heatmaps.set("Before", original_copy)
+            sorted_once = False
+            sort_duration = 0
+            metrics = new_metrics()
+            recorder = None
+            if recording:
+                # Only loaded once a sort is actually recorded
+                from sort_trace import TraceRecorder
+                recorder = TraceRecorder(working_data, requested)
+            sort_run = SortRun(current_sort, working_data, metrics, ANIMATION_SECONDS, FPS, recorder)
+            profiler.begin_sort(requested)
+            full_redraw = True
+            requested = None
+
+        if race_requested:
+            # Every lane sorts its own copy of the grid as it is shown now
+            if sort_run:
+                profiler.end_sort("cancelled")
+                working_data.order[:] = original_copy.order
+                sort_run = None
+                current_sort = None
+            lineup = [name for name in sort_funcs if name in race_lineup] or list(RACE_DEFAULT)
+            active_race = Race({name: sort_funcs[name] for name in lineup}, working_data, ANIMATION_SECONDS, FPS)
+            race_view = RaceView(active_race)
+            race_reported = False
+            race_requested = False
+
+        profiler.lap("events")
+
+        # Every race lane gets the same share of this frame's budget
+        if active_race:
+            for lane, events in active_race.advance().items():
+                race_events[lane] = race_events.get(lane, []) + events
+            if active_race.done and not race_reported:
+                print(format_race_results(active_race))
+                race_reported = True
+
+        # Advance the running sort by this frame's budget of steps
+        if sort_run:
+            dirty.update(changed_indices(sort_run.advance()))
+            if sort_run.done:
+                sort_duration = sort_run.elapsed()
+                if sort_run.recorder is not None:
+                    from sort_trace import save_recording
+                    save_recording(sort_run.recorder, metrics, record_dir)
+                sort_run = None
+                sorted_once = True
+                summary = profiler.end_sort()
+                if summary:
+                    print(format_sort_summary(summary))
+                summary_lines = get_summary_text(working_data)
+                heatmaps.set("After", working_data)
+                comparison = (original_copy, working_data.snapshot())
+                full_redraw = True
+        profiler.lap("compute")
+
+        theme = color_themes[current_theme_index]
+        # Whole-window repaints are flipped; otherwise only `updated` is pushed
+        flip = full_redraw or active_race
+        updated = []
+        if active_race:
+            # Lanes draw into their own viewports in place of the single-sort view
+            race_view.draw(screen, font, race_events, theme)
+            race_events = {}
+            draw_race_status(screen, font, active_race)
+        else:
+            # Whole-order changes rebuild the per-column buckets from scratch
+            if full_redraw:
+                columns = ColumnStats(working_data, WIDTH)
+
+            # Hover maps the pixel column to its bar, or to the first point of its bucket
+            mouse_x, _ = pygame.mouse.get_pos()
+            hover_column = columns.column_at(mouse_x)
+            hover_index = columns.positions(hover_column)[0] if hover_column is not None else None
+
+            # Repaint changed bars plus the previous and current highlights
+            highlight = tuple(sort_run.highlight if sort_run else ()) + (hover_index,)
+            dirty.update(i for i in drawn_highlight + highlight if i is not None)
+            bar_rects = paint_bars(bar_layer, working_data, font, columns, dirty, highlight, theme, full_redraw)
+            full_redraw = False
+            drawn_highlight = highlight
+            if flip:
+                screen.blit(bar_layer, (0, 0))
+            else:
+                # Last frame's UI comes off too, so text is never blended over itself
+                updated = bar_rects + ui_rects
+                for rect in updated:
+                    screen.blit(bar_layer, rect, rect)
+            ui_rects = []
+
+            # Draw summary text
+            for i, line in enumerate(summary_lines):
+                label = font.render(line, True, (255, 255, 255))
+                ui_rects.append(screen.blit(label, (10, 50 + i * 20)))
+            ui_rects.append(draw_summary_histogram(screen, working_data, theme))
+
+            # Show sorting metrics, live while a sort runs
+            if current_sort and (sorted_once or sort_run):
+                duration = sort_run.elapsed() if sort_run else sort_duration
+                label_time = font.render(f"Sort Time: {duration:.2f}s", True, (255, 255, 255))
+                ui_rects.append(screen.blit(label_time, (10, 50 + len(summary_lines) * 20)))
+                label_comp = font.render(f"Comparisons: {metrics['comparisons']}", True, (255, 255, 255))
+                ui_rects.append(screen.blit(label_comp, (10, 50 + len(summary_lines) * 20 + 20)))
+                label_swaps = font.render(f"Swaps: {metrics['swaps']}", True, (255, 255, 255))
+                ui_rects.append(screen.blit(label_swaps, (10, 50 + len(summary_lines) * 20 + 40)))
+                if metrics["passes"]:
+                    label_passes = font.render(f"Passes: {metrics['passes']}", True, (255, 255, 255))
+                    ui_rects.append(screen.blit(label_passes, (10, 50 + len(summary_lines) * 20 + 60)))
+            if sort_run:
+                ui_rects.append(draw_sort_status(screen, font, sort_run))
+
+            # Show hover info
+            if hover_column is not None:
+                start, end = columns.positions(hover_column)
+                if end - start == 1:
+                    lat, lon, elev, _ = working_data[start]
+                    hover_text = f"{lat:.2f}, {lon:.2f} → {elev:.2f} m"
+                else:
+                    hover_text = (f"Cells {start}–{end - 1}: {columns.min[hover_column]:.0f} / "
+                                  f"{columns.mean[hover_column]:.0f} / {columns.max[hover_column]:.0f} m")
+                hover_label = font.render(hover_text, True, (255, 255, 0))
+                ui_rects.append(screen.blit(hover_label, (WIDTH - 260, HEIGHT - 40)))
+
+            ui_rects.append(heatmaps.draw(screen, font, theme, get_color_lut(theme)))
+            ui_rects.append(draw_prefetch_stats(screen, font, prefetcher.stats()))
 
         # Draw buttons
-        for rect, name in buttons:
-            color = (200, 50, 50) if sort_funcs[name] == current_sort else (50, 50, 200)
-            pygame.draw.rect(screen, color, rect)
-            label = font.render(name, True, (255, 255, 255))
-            screen.blit(label, label.get_rect(center=rect.center))
-
-        # Draw summary text
-        for i, line in enumerate(summary_lines):
-            label = font.render(line, True, (255, 255, 255))
-            screen.blit(label, (10, 50 + i * 20))
-
-        # Show sorting metrics
-        if current_sort and sorted_once:
-            label_time = font.render(f"Sort Time: {sort_duration:.2f}s", True, (255, 255, 255))
-            screen.blit(label_time, (10, 50 + len(summary_lines) * 20))
-            label_comp = font.render(f"Comparisons: {metrics['comparisons']}", True, (255, 255, 255))
-            screen.blit(label_comp, (10, 50 + len(summary_lines) * 20 + 20))
-            label_swaps = font.render(f"Swaps: {metrics['swaps']}", True, (255, 255, 255))
-            screen.blit(label_swaps, (10, 50 + len(summary_lines) * 20 + 40))
-
-        # Show hover info
-        if hover_index is not None and 0 <= hover_index < len(working_data):
-            lat, lon, elev, _ = working_data[hover_index]
-            hover_label = font.render(f"{lat:.2f}, {lon:.2f} → {elev:.2f} m", True, (255, 255, 0))
-            screen.blit(hover_label, (WIDTH - 260, HEIGHT - 40))
+        active = next((name for name, func in sort_funcs.items() if func is current_sort), None)
+        ui_rects.append(screen.blit(button_strip.get(active, tuple(race_lineup)), button_area))
 
         # Footer text
-        footer = font.render("R = Reset | S = Shuffle | C = Theme | ESC = Quit | Click a sort", True, (180, 180, 180))
-        screen.blit(footer, (10, HEIGHT - 20))
+        ui_rects.append(screen.blit(font.render(RACE_FOOTER if active_race else FOOTER, True, (180, 180, 180)), (10, HEIGHT - 20)))
+
+        if profiler.enabled:
+            ui_rects.append(draw_profile_overlay(screen, font, profiler))
+        ui_rects = [rect for rect in ui_rects if rect is not None]
+        profiler.lap("draw")
+
+        if flip:
+            pygame.display.flip()
+        else:
+            pygame.display.update(updated + ui_rects)
+        profiler.lap("flip")
+        clock.tick(FPS)
+        profiler.lap("wait")
+        profiler.end_frame()
+
+    profiler.end_sort("cancelled")
+    if export_on_exit and profiler.trace:
+        export_profile(trace_path)
+    prefetcher.close()
+    pygame.quit()
+
+
+def draw_replay_status(screen, font, run):
+    # Trace name, position, live counts and a progress bar
+    total = len(run)
+    state = "Paused" if run.paused else ("Done" if run.done else "Playing")
+    lines = [f"Replay: {run.trace.algorithm} | {state} | speed {run.scheduler.speed:g}x",
+             f"Step {run.position} / {total}",
+             f"Comparisons: {run.metrics['comparisons']}  Swaps: {run.metrics['swaps']}"]
+    if run.metrics["passes"]:
+        lines[-1] += f"  Passes: {run.metrics['passes']}"
+    for i, line in enumerate(lines):
+        screen.blit(font.render(line, True, (255, 255, 255)), (10, 55 + i * 20))
+
+    pygame.draw.rect(screen, (80, 80, 80), REPLAY_BAR)
+    filled = REPLAY_BAR.copy()
+    filled.width = int(REPLAY_BAR.width * run.position / total) if total else REPLAY_BAR.width
+    pygame.draw.rect(screen, (255, 200, 0), filled)
+
+
+def run_replay(trace_path, color_theme="terrain"):
+    # Play a recorded trace back in a window, with scrubbing, without re-running the sort
+    from sort_trace import ReplayRun, SortTrace
+
+    trace = SortTrace.load(trace_path)
+    run = ReplayRun(trace, ANIMATION_SECONDS, FPS)
+    data = run.data
+
+    pygame.init()
+    screen = pygame.display.set_mode((WIDTH, HEIGHT))
+    pygame.display.set_caption(f"Elevation Sort Replay: {trace.algorithm}")
+    clock = pygame.time.Clock()
+    font = CachedFont(pygame.font.SysFont("Arial", 14))
+    bar_layer = pygame.Surface((WIDTH, HEIGHT)).convert()
+
+    color_themes = COLOR_THEMES
+    current_theme_index = color_themes.index(color_theme)
+    jump = max(1, len(trace) // 20)
+    full_redraw = True
+    drawn_highlight = ()
+    scrubbing = False
+    running = True
+
+    while running:
+        dirty = set()
+        position = run.position
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                running = False
+            elif event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_SPACE:
+                    run.toggle_pause()
+                elif event.key in (pygame.K_RIGHT, pygame.K_n):
+                    dirty.update(changed_indices(run.single_step()))
+                elif event.key in (pygame.K_LEFT, pygame.K_BACKSPACE):
+                    run.seek(run.position - 1)
+                elif event.key == pygame.K_PAGEUP:
+                    run.seek(run.position - jump)
+                elif event.key == pygame.K_PAGEDOWN:
+                    run.seek(run.position + jump)
+                elif event.key == pygame.K_HOME:
+                    run.seek(0)
+                elif event.key == pygame.K_END:
+                    run.seek(len(trace))
+                elif event.key in (pygame.K_UP, pygame.K_EQUALS, pygame.K_PLUS, pygame.K_KP_PLUS):
+                    run.scheduler.change_speed(2)
+                elif event.key in (pygame.K_DOWN, pygame.K_MINUS, pygame.K_KP_MINUS):
+                    run.scheduler.change_speed(0.5)
+                elif event.key == pygame.K_c:
+                    current_theme_index = (current_theme_index + 1) % len(color_themes)
+                    full_redraw = True
+                elif event.key == pygame.K_ESCAPE:
+                    running = False
+            elif event.type == pygame.MOUSEBUTTONDOWN and REPLAY_BAR.inflate(0, 10).collidepoint(event.pos):
+                scrubbing = True
+            elif event.type == pygame.MOUSEBUTTONUP:
+                scrubbing = False
+            if scrubbing and event.type in (pygame.MOUSEBUTTONDOWN, pygame.MOUSEMOTION):
+                fraction = (event.pos[0] - REPLAY_BAR.x) / REPLAY_BAR.width
+                run.seek(round(min(1.0, max(0.0, fraction)) * len(trace)))
+
+        # Any seek restored a checkpoint or skipped ahead, so redraw everything
+        if run.position != position and not dirty:
+            full_redraw = True
+        dirty.update(changed_indices(run.advance()))
+
+        if full_redraw:
+            columns = ColumnStats(data, WIDTH)
+        highlight = tuple(run.highlight)
+        dirty.update(i for i in drawn_highlight + highlight if i is not None)
+        paint_bars(bar_layer, data, font, columns, dirty, highlight, color_themes[current_theme_index], full_redraw)
+        full_redraw = False
+        drawn_highlight = highlight
+        screen.blit(bar_layer, (0, 0))
+
+        draw_replay_status(screen, font, run)
+        screen.blit(font.render(REPLAY_FOOTER, True, (180, 180, 180)), (10, HEIGHT - 20))
 
         pygame.display.flip()
+        clock.tick(FPS)
 
     pygame.quit()
 
 
+def export_replay_frames(trace_path, out_dir, frames=None, color_theme="terrain"):
+    # Render evenly spaced points of a trace to numbered PNGs without opening a
+    # window, e.g. for `ffmpeg -i frame_%05d.png sort.mp4`
+    from sort_trace import ReplayRun, SortTrace
+
+    trace = SortTrace.load(trace_path)
+    run = ReplayRun(trace, ANIMATION_SECONDS, FPS)
+    frames = frames or ANIMATION_SECONDS * FPS
+
+    pygame.font.init()
+    font = CachedFont(pygame.font.SysFont("Arial", 14))
+    surface = pygame.Surface((WIDTH, HEIGHT), depth=32)
+    columns = ColumnStats(run.data, WIDTH)
+    os.makedirs(out_dir, exist_ok=True)
+
+    for i, step in enumerate(np.linspace(0, len(trace), frames).astype(np.int64)):
+        # Seeking forward applies events from the current position onward
+        run.seek(step)
+        columns.refresh()
+        draw_bars(surface, run.data, font, highlight=run.highlight, color_theme=color_theme, columns=columns)
+        draw_replay_status(surface, font, run)
+        pygame.image.save(surface, os.path.join(out_dir, f"frame_{i:05d}.png"))
+    return frames
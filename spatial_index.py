@@ -0,0 +1,156 @@
+import numpy as np
+
+# Points per KD-tree leaf, scanned with one vectorized pass
+LEAF_SIZE = 32
+# How far a point query may be from a stored point and still match it, in degrees
+POINT_TOLERANCE = 1e-4
+
+
+class GridIndex:
+    # Direct lookup for row-major grids laid out by ElevationStore.from_grid:
+    # cell = row * cols + col with rows step degrees apart in latitude and cols
+    # step degrees apart in longitude. Queries are arithmetic on the lattice, so
+    # they cost O(1) for points and O(result) for boxes. Results are cell
+    # numbers, which stay valid however the display order is permuted.
+    def __init__(self, data, lat0, lon0, step):
+        self.data = data
+        self.rows = data.rows
+        self.cols = data.cols
+        self.lat0 = lat0
+        self.lon0 = lon0
+        self.step = step
+
+    def _row_col(self, lat, lon):
+        return round((lat - self.lat0) / self.step), round((lon - self.lon0) / self.step)
+
+    def cell_at(self, lat, lon, tolerance=POINT_TOLERANCE):
+        row, col = self._row_col(lat, lon)
+        if not (0 <= row < self.rows and 0 <= col < self.cols):
+            return None
+        if abs(self.lat0 + row * self.step - lat) > tolerance or abs(self.lon0 + col * self.step - lon) > tolerance:
+            return None
+        return row * self.cols + col
+
+    def nearest(self, lat, lon):
+        # On a regular lattice the nearest point is the clamped rounded one
+        row, col = self._row_col(lat, lon)
+        row = min(max(row, 0), self.rows - 1)
+        col = min(max(col, 0), self.cols - 1)
+        return row * self.cols + col
+
+    def cells_in_box(self, min_lat, min_lon, max_lat, max_lon, min_elev=None, max_elev=None):
+        # Points within POINT_TOLERANCE of an edge count as inside, like cell_at
+        slack = POINT_TOLERANCE / self.step
+        first_row = max(0, int(np.ceil((min_lat - self.lat0) / self.step - slack)))
+        last_row = min(self.rows - 1, int(np.floor((max_lat - self.lat0) / self.step + slack)))
+        first_col = max(0, int(np.ceil((min_lon - self.lon0) / self.step - slack)))
+        last_col = min(self.cols - 1, int(np.floor((max_lon - self.lon0) / self.step + slack)))
+        if first_row > last_row or first_col > last_col:
+            return np.empty(0, dtype=np.int64)
+        rows = np.arange(first_row, last_row + 1)[:, None]
+        cols = np.arange(first_col, last_col + 1)[None, :]
+        return _filter_elevation(self.data, (rows * self.cols + cols).ravel(), min_elev, max_elev)
+
+
+class KDTree:
+    # Implicit 2-d tree over (lat, lon) for points with no regular layout. Node
+    # k covers perm[lo:hi], has children 2k + 1 and 2k + 2, and splits at
+    # mid = (lo + hi) // 2 on latitude or longitude by depth: everything left of
+    # mid is <= splits[k] and everything from mid on is >= it. Distances are
+    # planar in degrees, which is fine for the small windows the visualizer loads.
+    def __init__(self, data, leaf_size=LEAF_SIZE):
+        self.data = data
+        self.leaf_size = leaf_size
+        self.points = np.column_stack([data.lat, data.lon]).astype(np.float64)
+        self.perm = np.arange(len(self.points))
+        levels = max(0, int(np.ceil(np.log2(max(1, len(self.points)) / leaf_size))))
+        self.splits = np.zeros(2 ** (levels + 1))
+        stack = [(0, 0, len(self.points), 0)]
+        while stack:
+            node, lo, hi, depth = stack.pop()
+            if hi - lo <= leaf_size:
+                continue
+            mid = (lo + hi) // 2
+            segment = self.perm[lo:hi]
+            self.perm[lo:hi] = segment[np.argpartition(self.points[segment, depth % 2], mid - lo)]
+            self.splits[node] = self.points[self.perm[mid], depth % 2]
+            stack.append((2 * node + 1, lo, mid, depth + 1))
+            stack.append((2 * node + 2, mid, hi, depth + 1))
+
+    def nearest(self, lat, lon):
+        if not len(self.points):
+            return None
+        query = np.array([lat, lon])
+        best, best_dist = None, np.inf
+        stack = [(0, 0, len(self.points), 0, 0.0)]
+        while stack:
+            node, lo, hi, depth, bound = stack.pop()
+            # bound is a lower limit on the distance to anything in this node
+            if bound >= best_dist:
+                continue
+            if hi - lo <= self.leaf_size:
+                cells = self.perm[lo:hi]
+                dist = ((self.points[cells] - query) ** 2).sum(axis=1)
+                i = int(dist.argmin())
+                if dist[i] < best_dist:
+                    best, best_dist = int(cells[i]), float(dist[i])
+                continue
+            mid = (lo + hi) // 2
+            gap = query[depth % 2] - self.splits[node]
+            left, right = (2 * node + 1, lo, mid, depth + 1), (2 * node + 2, mid, hi, depth + 1)
+            near, far = (right, left) if gap >= 0 else (left, right)
+            # The far side is at least as far away as the splitting line
+            stack.append((*far, max(bound, gap * gap)))
+            stack.append((*near, bound))
+        return best
+
+    def cell_at(self, lat, lon, tolerance=POINT_TOLERANCE):
+        cell = self.nearest(lat, lon)
+        if cell is None or np.abs(self.points[cell] - (lat, lon)).max() > tolerance:
+            return None
+        return cell
+
+    def cells_in_box(self, min_lat, min_lon, max_lat, max_lon, min_elev=None, max_elev=None):
+        low = np.array([min_lat, min_lon])
+        high = np.array([max_lat, max_lon])
+        found = []
+        stack = [(0, 0, len(self.points), 0)]
+        while stack:
+            node, lo, hi, depth = stack.pop()
+            if hi - lo <= self.leaf_size:
+                cells = self.perm[lo:hi]
+                points = self.points[cells]
+                found.append(cells[np.all((points >= low) & (points <= high), axis=1)])
+                continue
+            mid = (lo + hi) // 2
+            if low[depth % 2] <= self.splits[node]:
+                stack.append((2 * node + 1, lo, mid, depth + 1))
+            if high[depth % 2] >= self.splits[node]:
+                stack.append((2 * node + 2, mid, hi, depth + 1))
+        cells = np.sort(np.concatenate(found)) if found else np.empty(0, dtype=np.int64)
+        return _filter_elevation(self.data, cells, min_elev, max_elev)
+
+
+def _filter_elevation(data, cells, min_elev, max_elev):
+    if min_elev is not None:
+        cells = cells[data.elev[cells] >= min_elev]
+    if max_elev is not None:
+        cells = cells[data.elev[cells] <= max_elev]
+    return cells
+
+
+def build_spatial_index(data):
+    # Lattice lookup when the store is a full row-major grid, otherwise a KD-tree
+    rows, cols, n = data.rows, data.cols, len(data.lat)
+    if rows and cols and rows * cols == n and n > 1:
+        # Span over count keeps float32 rounding from accumulating across the grid
+        if cols > 1:
+            step = float(data.lon[cols - 1] - data.lon[0]) / (cols - 1)
+        else:
+            step = float(data.lat[-1] - data.lat[0]) / (rows - 1)
+        cells = np.arange(n)
+        lat0, lon0 = float(data.lat[0]), float(data.lon[0])
+        if step > 0 and np.allclose(data.lat, lat0 + cells // cols * step, atol=step / 100) \
+                and np.allclose(data.lon, lon0 + cells % cols * step, atol=step / 100):
+            return GridIndex(data, lat0, lon0, step)
+    return KDTree(data)
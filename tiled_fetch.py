@@ -0,0 +1,134 @@
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
+
+# Grid points per tile edge; a 64x64 tile is one request of 4096 cells
+TILE_SIZE = 64
+# Concurrent tile requests per grid
+MAX_WORKERS = 8
+# Tries per tile, and the first wait between them; waits double with jitter
+TILE_ATTEMPTS = 4
+RETRY_BACKOFF = 0.25
+MAX_BACKOFF = 4.0
+
+
+class PartialFetchError(Exception):
+    # Some tiles failed on every attempt. `grid` holds everything that did
+    # arrive and `missing` marks the cells that didn't, so callers can keep
+    # the partial grid instead of dropping the whole fetch.
+    def __init__(self, grid, missing, failures):
+        self.grid = grid
+        self.missing = missing
+        self.failures = failures
+        tiles = "; ".join(f"rows {top}-{bottom - 1}, cols {left}-{right - 1}: {error!r}"
+                          for (top, left, bottom, right), error in failures[:3])
+        more = f" (+{len(failures) - 3} more)" if len(failures) > 3 else ""
+        super().__init__(f"{len(failures)} tile(s) failed, {int(missing.sum())} of {missing.size} cells missing: {tiles}{more}")
+
+
+def grid_tiles(rows, cols, tile_size=TILE_SIZE):
+    # (top, left, bottom, right) cell ranges covering a rows x cols grid
+    return [(top, left, min(top + tile_size, rows), min(left + tile_size, cols))
+            for top in range(0, rows, tile_size) for left in range(0, cols, tile_size)]
+
+
+def crop_tile(grid, rows, cols):
+    # The service can return a row or column more than asked for at the edges
+    # of a bounding box; crop the extra, as the whole-grid fetch always did.
+    # A short tile stays short so the cells it lacks are reported as missing.
+    grid = np.asarray(grid)
+    if not grid.size:
+        return grid.reshape(0, 0)
+    if grid.ndim != 2:
+        raise ValueError(f"expected a {rows}x{cols} tile, got shape {grid.shape}")
+    return grid[:rows, :cols]
+
+
+class TiledSource:
+    # Wraps a remote source so large grids are fetched as tiles on a bounded
+    # thread pool. Each tile is retried with exponential backoff, the results
+    # are copied straight into one NumPy grid as they complete, and tiles that
+    # still fail are reported together in a PartialFetchError. Name and
+    # caching follow the wrapped source, so tiled and whole fetches share the
+    # grid cache.
+    def __init__(self, source, tile_size=TILE_SIZE, workers=MAX_WORKERS, attempts=TILE_ATTEMPTS,
+                 backoff=RETRY_BACKOFF, rng=None):
+        self.source = source
+        self.name = source.name
+        self.cacheable = source.cacheable
+        self.tile_size = tile_size
+        self.workers = workers
+        self.attempts = attempts
+        self.backoff = backoff
+        self.rng = rng or random.Random()
+        self.last_stats = None
+        self._lock = threading.Lock()
+
+    def _fetch_tile(self, lat, lon, tile, step):
+        top, left, bottom, right = tile
+        delay = self.backoff
+        retries = 0
+        while True:
+            try:
+                grid = self.source.fetch(lat + top * step, lon + left * step, bottom - top, right - left, step)
+                break
+            except Exception:
+                retries += 1
+                if retries >= self.attempts:
+                    raise
+            with self._lock:
+                jitter = self.rng.uniform(0.5, 1.0)
+            time.sleep(delay * jitter)
+            delay = min(delay * 2, MAX_BACKOFF)
+        return grid, retries
+
+    def fetch(self, lat, lon, rows, cols, step):
+        start = time.perf_counter()
+        tiles = grid_tiles(rows, cols, self.tile_size)
+        grid = None
+        missing = np.ones((rows, cols), dtype=bool)
+        failures = []
+        retries = 0
+
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(tiles))) as pool:
+            futures = {pool.submit(self._fetch_tile, lat, lon, tile, step): tile for tile in tiles}
+            for future in as_completed(futures):
+                top, left, bottom, right = tile = futures[future]
+                try:
+                    values, tile_retries = future.result()
+                except Exception as e:
+                    failures.append((tile, e))
+                    retries += self.attempts - 1
+                    continue
+                retries += tile_retries
+                # Not retried: asking again returns the same shape
+                try:
+                    values = crop_tile(values, bottom - top, right - left)
+                except ValueError as e:
+                    failures.append((tile, e))
+                    continue
+                height, width = values.shape
+                if (height, width) != (bottom - top, right - left):
+                    failures.append((tile, ValueError(f"expected a {bottom - top}x{right - left} tile, got {height}x{width}")))
+                    if not values.size:
+                        continue
+                # Sized from the first tile; widened if a later one needs a larger dtype
+                if grid is None:
+                    grid = np.zeros((rows, cols), dtype=values.dtype)
+                elif np.result_type(grid, values) != grid.dtype:
+                    grid = grid.astype(np.result_type(grid, values))
+                grid[top:top + height, left:left + width] = values
+                missing[top:top + height, left:left + width] = False
+
+        seconds = time.perf_counter() - start
+        self.last_stats = {"tiles": len(tiles), "failed": len(failures), "retries": retries,
+                           "seconds": seconds, "cells_per_second": (rows * cols - int(missing.sum())) / seconds if seconds else 0.0}
+        if grid is None:
+            grid = np.zeros((rows, cols), dtype=np.int16)
+        if failures:
+            failures.sort(key=lambda failure: failure[0])
+            raise PartialFetchError(grid, missing, failures)
+        return grid
@@ -0,0 +1,59 @@
+import collections
+
+# Rendered strings kept per font; live counters add a new string every frame,
+# so old ones are dropped least recently used first
+TEXT_CACHE_SIZE = 512
+
+
+class CachedFont:
+    # Drop-in for a pygame Font whose render() reuses the surface from the last
+    # time the same text was drawn in the same colors. Labels that don't change
+    # cost a dictionary lookup instead of a glyph rasterization per frame.
+    def __init__(self, font, max_entries=TEXT_CACHE_SIZE):
+        self.font = font
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._surfaces = collections.OrderedDict()
+
+    def render(self, text, antialias, color, background=None):
+        key = (text, antialias, tuple(color), tuple(background) if background is not None else None)
+        surface = self._surfaces.get(key)
+        if surface is not None:
+            self._surfaces.move_to_end(key)
+            self.hits += 1
+            return surface
+        self.misses += 1
+        surface = self.font.render(text, antialias, color, background)
+        self._surfaces[key] = surface
+        if len(self._surfaces) > self.max_entries:
+            self._surfaces.popitem(last=False)
+        return surface
+
+    def clear(self):
+        self._surfaces.clear()
+
+    def __getattr__(self, name):
+        # size(), get_height() and the rest come straight from the wrapped font
+        return getattr(self.font, name)
+
+
+class SurfaceCache:
+    # Surfaces built by `build(*key)` and kept until a different key is asked
+    # for, e.g. a panel keyed on the theme and the data it shows
+    def __init__(self, build):
+        self.build = build
+        self.key = None
+        self.surface = None
+        self.builds = 0
+
+    def get(self, *key):
+        if self.surface is None or key != self.key:
+            self.surface = self.build(*key)
+            self.key = key
+            self.builds += 1
+        return self.surface
+
+    def invalidate(self):
+        self.surface = None
+